@@ -118,6 +118,7 @@ def list(service_name,
 @aria.options.dry_execution
 @aria.options.task_max_attempts()
 @aria.options.task_retry_interval()
+@aria.options.max_concurrency
 @aria.options.mark_pattern()
 @aria.options.verbose()
 @aria.pass_model_storage
@@ -130,6 +131,7 @@ def start(workflow_name,
           dry,
           task_max_attempts,
           task_retry_interval,
+          max_concurrency,
           mark_pattern,
           model_storage,
           resource_storage,
@@ -154,7 +156,7 @@ def start(workflow_name,
     )
     workflow_ctx = compiler.prepare(inputs, executor=executor)
 
-    engine = Engine(executor)
+    engine = Engine(executor, max_concurrency=max_concurrency)
     logger.info('Starting {0}execution. Press Ctrl+C cancel'.format('dry ' if dry else ''))
 
     _run_execution(engine, workflow_ctx, logger, model_storage, dry, mark_pattern)
@@ -165,6 +167,7 @@ def start(workflow_name,
 @aria.argument('execution-id')
 @aria.options.dry_execution
 @aria.options.retry_failed_tasks
+@aria.options.max_concurrency
 @aria.options.mark_pattern()
 @aria.options.verbose()
 @aria.pass_model_storage
@@ -174,6 +177,7 @@ def start(workflow_name,
 def resume(execution_id,
            retry_failed_tasks,
            dry,
+           max_concurrency,
            mark_pattern,
            model_storage,
            resource_storage,
@@ -202,7 +206,7 @@ def resume(execution_id,
         execution_to_resume.workflow_name
     ).prepare(execution_id=execution_to_resume.id)
 
-    engine = Engine(executor)
+    engine = Engine(executor, max_concurrency=max_concurrency)
 
     logger.info('Resuming {0}execution. Press Ctrl+C cancel'.format('dry ' if dry else ''))
     _run_execution(engine, workflow_ctx, logger, model_storage, dry, mark_pattern,
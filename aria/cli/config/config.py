@@ -22,6 +22,7 @@ import pkg_resources
 
 from jinja2.environment import Template
 
+from ...storage import sql_mapi
 from ...utils.yaml import yaml
 
 
@@ -59,6 +60,20 @@ class CliConfig(object):
     def logging(self):
         return self.Logging(self._config.get('logging'))
 
+    @property
+    def storage(self):
+        return self.Storage(self._config.get('storage'))
+
+    class Storage(object):
+
+        def __init__(self, storage):
+            self._storage = storage or {}
+
+        @property
+        def sqlite(self):
+            # Configurations created before the storage section existed get the tuned profile too
+            return self._storage.get('sqlite', sql_mapi.SQLITE_PROFILE)
+
     class Logging(object):
 
         def __init__(self, logging):
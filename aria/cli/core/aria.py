@@ -321,6 +321,11 @@ class Options(object):
             is_flag=True,
             help=helptexts.DRY_EXECUTION)
 
+        self.max_concurrency = click.option(
+            '--max-concurrency',
+            type=int,
+            help=helptexts.MAX_CONCURRENCY)
+
         self.retry_failed_tasks = click.option(
             '--retry-failed-tasks',
             is_flag=True,
@@ -108,7 +108,8 @@ class _Environment(object):
         if not os.path.exists(self._model_storage_dir):
             os.makedirs(self._model_storage_dir)
 
-        initiator_kwargs = dict(base_dir=self._model_storage_dir)
+        initiator_kwargs = dict(base_dir=self._model_storage_dir,
+                                profile=self._config.storage.sqlite)
         return application_model_storage(
             SQLAlchemyModelAPI,
             initiator_kwargs=initiator_kwargs)
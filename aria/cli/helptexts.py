@@ -47,6 +47,8 @@ TASK_MAX_ATTEMPTS = \
 DRY_EXECUTION = "Execute a workflow dry run (prints operations information without causing side " \
                 "effects)"
 RETRY_FAILED_TASK = "Retry tasks that failed in the previous execution attempt"
+MAX_CONCURRENCY = "Maximum number of tasks to run at the same time; tasks beyond that are queued " \
+                  "until running tasks end [default: no limit]"
 IGNORE_AVAILABLE_NODES = "Delete the service even if it has available nodes"
 SORT_BY = "Key for sorting the list"
 DESCENDING = "Sort list in descending order [default: False]"
@@ -118,6 +118,10 @@ class Logging(object):
 
 class ModelLogIterator(object):
 
+    # Logs are streamed, so that following (or listing) the logs of a long execution takes the same
+    # memory and time per log however many logs there are
+    BATCH_SIZE = 1000
+
     def __init__(self, model_storage, execution_id, filters=None, sort=None, offset=0):
         self._last_visited_id = offset
         self._model_storage = model_storage
@@ -129,6 +133,8 @@ class ModelLogIterator(object):
         filters = dict(execution_fk=self._execution_id, id=dict(gt=self._last_visited_id))
         filters.update(self._additional_filters)
 
-        for log in self._model_storage.log.iter(filters=filters, sort=self._sort):
+        for log in self._model_storage.log.iter(filters=filters,
+                                                sort=self._sort,
+                                                batch_size=self.BATCH_SIZE):
             self._last_visited_id = log.id
             yield log
@@ -60,6 +60,7 @@ class _ExtensionRegistration(object):
     def __init__(self):
         self._registrars = {}
         self._registered_classes = []
+        self._initialized_classes_count = 0
         for attr, value in vars(self.__class__).items():
             try:
                 is_registrar_function = value._registrar_function
@@ -77,8 +78,13 @@ class _ExtensionRegistration(object):
     def init(self):
         """
         Initialize all registrars by calling all registered functions.
+
+        Classes registered since the previous call are initialized, so it may be called again once
+        more classes are registered.
         """
-        registered_instances = [cls() for cls in self._registered_classes]
+        registered_instances = [cls() for cls in
+                                self._registered_classes[self._initialized_classes_count:]]
+        self._initialized_classes_count = len(self._registered_classes)
         for name, registrar in self._registrars.items():
             for instance in registered_instances:
                 registrating_function = getattr(instance, name, None)
@@ -90,7 +90,9 @@ class WorkflowContext(BaseContext):
         return self.model.node.iter(
             filters={
                 key: getattr(self.service, self.service.name_column_name())
-            }
+            },
+            # Loaded up front, since workflows walk them for every node
+            load=['interfaces.operations', 'outbound_relationships']
         )
 
 
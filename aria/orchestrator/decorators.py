@@ -17,6 +17,8 @@
 Workflow and operation decorators.
 """
 
+import inspect
+import sys
 from functools import partial, wraps
 
 from ..utils.validation import validate_function_arguments
@@ -75,10 +77,34 @@ def operation(func=None, toolbelt=False, suffix_template='', logging_handlers=No
             func_kwargs.setdefault('toolbelt', operation_toolbelt)
         validate_function_arguments(func, func_kwargs)
         with ctx.model.instrument(*ctx.INSTRUMENTATION_FIELDS):
-            return func(**func_kwargs)
+            result = func(**func_kwargs)
+        if inspect.isgenerator(result):
+            return _instrumented_generator(result, ctx)
+        return result
     return _wrapper
 
 
+def _instrumented_generator(generator, ctx):
+    """
+    Instruments the storage whenever a generator operation (run as a coroutine) is resumed, since
+    other operations may run in between.
+    """
+    value, exc_info = None, None
+    while True:
+        with ctx.model.instrument(*ctx.INSTRUMENTATION_FIELDS):
+            try:
+                if exc_info is None:
+                    wait = generator.send(value)
+                else:
+                    wait = generator.throw(exc_info[0], exc_info[1], exc_info[2])
+            except StopIteration:
+                return
+        try:
+            value, exc_info = (yield wait), None
+        except BaseException:
+            value, exc_info = None, sys.exc_info()
+
+
 def _generate_name(func_name, ctx, suffix_template, **custom_kwargs):
     return u'{func_name}.{suffix}'.format(
         func_name=func_name,
@@ -0,0 +1,332 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Long-lived engine service, running many executions concurrently in a single process.
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+
+from aria import logger
+
+from .execution_preparer import ExecutionPreparer
+from .workflows.core.engine import Engine
+from .workflows.executor.process import ProcessExecutor
+
+
+_INT_FMT = 'I'
+_INT_SIZE = struct.calcsize(_INT_FMT)
+
+
+class EngineService(logger.LoggerMixin):
+    """
+    Runs many executions concurrently on a single engine, each execution on its own thread.
+
+    All the executions share the executors, the model storage (and thus its connection pool) and
+    the engine's concurrency limits, which are divided fairly among the executions competing for
+    them.
+
+    Executions may be started and cancelled either directly, or by :class:`EngineServiceClient`
+    instances over a local socket (see :attr:`address`). The socket is a Unix socket in a directory
+    only the user running the service can access; where Unix sockets aren't available (e.g. on
+    Windows), it is a TCP socket on the loopback interface, which any local user can connect to.
+
+    :param model_storage: model storage
+    :param resource_storage: resource storage
+    :param plugin_manager: plugin manager
+    :param executors: executors to run the tasks with (defaults to a single process executor)
+    :param engine_kwargs: keyword arguments for the :class:`Engine` (e.g. ``max_concurrency``)
+    """
+
+    def __init__(self, model_storage, resource_storage, plugin_manager, executors=None,
+                 **engine_kwargs):
+        super(EngineService, self).__init__()
+        self._model_storage = model_storage
+        self._resource_storage = resource_storage
+        self._plugin_manager = plugin_manager
+        self._executors = executors or [ProcessExecutor(plugin_manager=plugin_manager)]
+        self._engine = Engine(*self._executors, **engine_kwargs)
+        # Running executions' threads and workflow contexts, by execution ID
+        self._executions = {}
+        self._executions_lock = threading.Lock()
+        self._server_socket = None
+        self._server_address = None
+        self._server_dir = None
+        self._listener_thread = None
+        self._listening = False
+
+    @property
+    def address(self):
+        """
+        Address of the local socket the service listens on (a path, or a host and port where Unix
+        sockets aren't available), or ``None`` if it isn't listening.
+        """
+        return self._server_address
+
+    def listen(self):
+        """
+        Starts accepting requests over a local socket.
+        """
+        self._server_socket, self._server_address, self._server_dir = _create_server_socket()
+        self._listening = True
+        self._listener_thread = threading.Thread(target=self._listener)
+        self._listener_thread.daemon = True
+        self._listener_thread.start()
+
+    def close(self):
+        """
+        Stops accepting requests, cancels the running executions and waits for them to end.
+        """
+        if self._listening:
+            self._listening = False
+            # Wake the listener up, so it notices it should stop
+            _connect(self._server_address).close()
+            self._listener_thread.join()
+            self._server_socket.close()
+            self._server_socket = None
+            self._server_address = None
+            if self._server_dir:
+                shutil.rmtree(self._server_dir, ignore_errors=True)
+                self._server_dir = None
+        for execution_id in self.running_executions:
+            self.cancel(execution_id)
+        for execution_id in self.running_executions:
+            self.wait(execution_id)
+
+    @property
+    def running_executions(self):
+        """
+        IDs of the executions which are currently run by the service.
+        """
+        with self._executions_lock:
+            return self._executions.keys()
+
+    def start(self, service_name, workflow_name, inputs=None, task_max_attempts=None,
+              task_retry_interval=None):
+        """
+        Creates a new execution of the workflow and starts running it in the background.
+
+        :return: ID of the new execution
+        """
+        service = self._model_storage.service.get_by_name(service_name)
+        preparer = ExecutionPreparer(
+            self._model_storage,
+            self._resource_storage,
+            self._plugin_manager,
+            service,
+            workflow_name,
+            task_max_attempts=task_max_attempts,
+            task_retry_interval=task_retry_interval
+        )
+        ctx = preparer.prepare(inputs, executor=self._executors[0])
+        self._run(ctx)
+        return ctx.execution.id
+
+    def resume(self, execution_id, retry_failed=False):
+        """
+        Resumes a cancelled or failed execution in the background.
+        """
+        execution = self._model_storage.execution.get(execution_id)
+        preparer = ExecutionPreparer(
+            self._model_storage,
+            self._resource_storage,
+            self._plugin_manager,
+            execution.service,
+            execution.workflow_name
+        )
+        ctx = preparer.prepare(execution_id=execution_id)
+        self._run(ctx, resuming=True, retry_failed=retry_failed)
+
+    def cancel(self, execution_id):
+        """
+        Requests a running execution to be cancelled.
+        """
+        with self._executions_lock:
+            _, ctx = self._executions[execution_id]
+        # Handled by the thread of the execution, which might still be starting it
+        self._engine.request_cancel(ctx)
+
+    def wait(self, execution_id, timeout=None):
+        """
+        Waits for a running execution to end.
+
+        :return: whether the execution has ended
+        """
+        with self._executions_lock:
+            execution = self._executions.get(execution_id)
+        if execution is not None:
+            execution[0].join(timeout)
+            return not execution[0].is_alive()
+        return True
+
+    def _run(self, ctx, **kwargs):
+        execution_id = ctx.execution.id
+        thread = threading.Thread(target=self._execute, args=(ctx, ), kwargs=kwargs,
+                                  name='execution-{0}'.format(execution_id))
+        thread.daemon = True
+        with self._executions_lock:
+            self._executions[execution_id] = (thread, ctx)
+        thread.start()
+
+    def _execute(self, ctx, **kwargs):
+        try:
+            self._engine.execute(ctx, **kwargs)
+        except BaseException as e:
+            # The failure is already recorded on the execution model
+            self.logger.debug('Execution {0} failed: {1}'.format(ctx._execution_id, e))
+        finally:
+            with self._executions_lock:
+                del self._executions[ctx._execution_id]
+
+    def _listener(self):
+        while True:
+            connection = self._server_socket.accept()[0]
+            with contextlib.closing(connection):
+                if not self._listening:
+                    return
+                try:
+                    request = _recv_message(connection)
+                    response = {'result': self._handle_request(request)}
+                except BaseException as e:
+                    self.logger.debug('Failed handling request: {0}'.format(e))
+                    response = {'error': '{0}: {1}'.format(type(e).__name__, e)}
+                try:
+                    _send_message(connection, response)
+                except socket.error:
+                    # The client is gone
+                    pass
+
+    def _handle_request(self, request):
+        request_type = request.pop('type')
+        if request_type == 'start':
+            return self.start(**request)
+        elif request_type == 'resume':
+            return self.resume(**request)
+        elif request_type == 'cancel':
+            return self.cancel(**request)
+        elif request_type == 'list':
+            return self.running_executions
+        raise RuntimeError('Invalid request type: {0}'.format(request_type))
+
+
+class EngineServiceError(Exception):
+    """
+    Raised by :class:`EngineServiceClient` when the service failed handling a request.
+    """
+    pass
+
+
+class EngineServiceClient(object):
+    """
+    Sends requests to an :class:`EngineService` over its local socket.
+
+    :param address: address the service listens on (see :attr:`EngineService.address`)
+    """
+
+    def __init__(self, address):
+        self._address = address
+
+    def start(self, service_name, workflow_name, inputs=None, task_max_attempts=None,
+              task_retry_interval=None):
+        """
+        Starts a new execution of the workflow.
+
+        :return: ID of the new execution
+        """
+        return self._request('start',
+                             service_name=service_name,
+                             workflow_name=workflow_name,
+                             inputs=inputs,
+                             task_max_attempts=task_max_attempts,
+                             task_retry_interval=task_retry_interval)
+
+    def resume(self, execution_id, retry_failed=False):
+        """
+        Resumes a cancelled or failed execution.
+        """
+        self._request('resume', execution_id=execution_id, retry_failed=retry_failed)
+
+    def cancel(self, execution_id):
+        """
+        Requests a running execution to be cancelled.
+        """
+        self._request('cancel', execution_id=execution_id)
+
+    def list(self):
+        """
+        IDs of the executions which are currently run by the service.
+        """
+        return self._request('list')
+
+    def _request(self, type, **kwargs):
+        kwargs['type'] = type
+        with contextlib.closing(_connect(self._address)) as connection:
+            _send_message(connection, kwargs)
+            response = _recv_message(connection)
+        if 'error' in response:
+            raise EngineServiceError(response['error'])
+        return response['result']
+
+
+def _create_server_socket():
+    if hasattr(socket, 'AF_UNIX'):
+        # Created accessible only by the current user
+        server_dir = tempfile.mkdtemp(prefix='aria-engine-service-')
+        address = os.path.join(server_dir, 'service.sock')
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server_socket.bind(address)
+    else:
+        server_dir = None
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.bind(('localhost', 0))
+        address = server_socket.getsockname()
+    server_socket.listen(10)
+    return server_socket, address, server_dir
+
+
+def _connect(address):
+    family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+    connection = socket.socket(family, socket.SOCK_STREAM)
+    connection.connect(address)
+    return connection
+
+
+def _send_message(connection, message):
+    data = json.dumps(message)
+    connection.sendall(struct.pack(_INT_FMT, len(data)) + data)
+
+
+def _recv_message(connection):
+    length = struct.unpack(_INT_FMT, _recv_bytes(connection, _INT_SIZE))[0]
+    return json.loads(_recv_bytes(connection, length))
+
+
+def _recv_bytes(connection, count):
+    result = io.BytesIO()
+    while count:
+        read = connection.recv(count)
+        if not read:
+            break
+        result.write(read)
+        count -= len(read)
+    return result.getvalue()
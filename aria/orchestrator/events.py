@@ -24,6 +24,8 @@ sent_task_signal = signal('sent_task_signal')
 start_task_signal = signal('start_task_signal')
 on_success_task_signal = signal('success_task_signal')
 on_failure_task_signal = signal('failure_task_signal')
+# sent once the outcome of a task attempt (success, failure or retry) has been stored:
+ended_task_signal = signal('ended_task_signal')
 
 # workflow engine workflow signals:
 start_workflow_signal = signal('start_workflow_signal')
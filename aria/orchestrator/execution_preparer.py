@@ -20,7 +20,7 @@ from datetime import datetime
 from . import exceptions
 from .context.workflow import WorkflowContext
 from .workflows import builtin
-from .workflows.core import graph_compiler
+from .workflows.core import graph_compiler, execution_plan
 from .workflows.executor.process import ProcessExecutor
 from ..modeling import models
 from ..modeling import utils as modeling_utils
@@ -30,10 +30,18 @@ from ..utils.imports import import_fullname
 DEFAULT_TASK_MAX_ATTEMPTS = 30
 DEFAULT_TASK_RETRY_INTERVAL = 30
 
+# Plans of the built-in workflows, by workflow, executor, inputs, task settings and service
+# fingerprint
+plan_cache = execution_plan.ExecutionPlanCache()
+
 
 class ExecutionPreparer(object):
     """
     This class manages any execution and tasks related preparation for an execution of a workflow.
+
+    The compiled tasks of the built-in workflows are cached (see :data:`plan_cache`), so that
+    further executions of the same workflow on an unchanged service clone them instead of compiling
+    the workflow again. Custom workflows aren't cached, as they may depend on anything.
     """
     def __init__(
             self,
@@ -43,7 +51,8 @@ class ExecutionPreparer(object):
             service,
             workflow_name,
             task_max_attempts=None,
-            task_retry_interval=None
+            task_retry_interval=None,
+            use_plan_cache=True
     ):
         self._model = model_storage
         self._resource = resource_storage
@@ -52,6 +61,7 @@ class ExecutionPreparer(object):
         self._workflow_name = workflow_name
         self._task_max_attempts = task_max_attempts or DEFAULT_TASK_MAX_ATTEMPTS
         self._task_retry_interval = task_retry_interval or DEFAULT_TASK_RETRY_INTERVAL
+        self._use_plan_cache = use_plan_cache
 
     def get_workflow_ctx(self, execution):
         return WorkflowContext(
@@ -79,12 +89,13 @@ class ExecutionPreparer(object):
         assert not (execution_inputs and executor and execution_id)
 
         if execution_id is None:
-            # If the execution is new
-            execution = self._create_execution_model(execution_inputs)
-            self._model.execution.put(execution)
-            ctx = self.get_workflow_ctx(execution)
-            self._create_tasks(ctx, executor)
-            self._model.execution.update(execution)
+            # If the execution is new, it is stored along with its tasks in a single transaction
+            with self._model.batch():
+                execution = self._create_execution_model(execution_inputs)
+                self._model.execution.put(execution)
+                ctx = self.get_workflow_ctx(execution)
+                self._create_tasks(ctx, executor)
+                self._model.execution.update(execution)
         else:
             # If resuming an execution
             execution = self._model.execution.get(execution_id)
@@ -100,10 +111,33 @@ class ExecutionPreparer(object):
         # transforming the execution inputs to dict, to pass them to the workflow function
         execution_inputs_dict = dict(inp.unwrapped for inp in ctx.execution.inputs.itervalues())
 
+        plan_key = self._get_plan_key(ctx, executor, execution_inputs_dict)
+        plan = plan_cache.get(plan_key) if plan_key else None
+        if plan is not None:
+            execution = ctx.execution
+            plan.instantiate(execution)
+            self._model.execution.update(execution)
+            return
+
         workflow_fn = self._get_workflow_fn(ctx.execution.workflow_name)
         api_tasks_graph = workflow_fn(ctx=ctx, **execution_inputs_dict)
-        compiler = graph_compiler.GraphCompiler(ctx, executor.__class__)
+        compiler = graph_compiler.GraphCompiler(ctx, executor.__class__,
+                                                record_plan=plan_key is not None,
+                                                optimize=True)
         compiler.compile(api_tasks_graph)
+        if plan_key is not None:
+            plan_cache.put(plan_key, compiler.plan)
+
+    def _get_plan_key(self, ctx, executor, execution_inputs):
+        if not self._use_plan_cache or ctx.execution.workflow_name not in builtin.BUILTIN_WORKFLOWS:
+            return None
+        return (ctx.execution.workflow_name,
+                executor.__class__,
+                repr(sorted(execution_inputs.iteritems())),
+                ctx._task_max_attempts,
+                ctx._task_retry_interval,
+                ctx._task_ignore_failure,
+                execution_plan.service_fingerprint(self._service))
 
     def _create_execution_model(self, inputs=None):
         self._validate_workflow_exists_for_service()
@@ -17,10 +17,9 @@
 Task graph.
 """
 
+from array import array
 from collections import Iterable
 
-from networkx import DiGraph, topological_sort
-
 from ....utils.uuid import generate_uuid
 from . import task as api_task
 
@@ -32,6 +31,14 @@ class TaskNotInGraphError(Exception):
     pass
 
 
+class TaskGraphCycleError(Exception):
+    """
+    An error representing a scenario where the tasks of the graph depend on each other in a cycle,
+    and thus cannot be sorted topologically.
+    """
+    pass
+
+
 def _filter_out_empty_tasks(func=None):
     if func is None:
         return lambda f: _filter_out_empty_tasks(func=f)
@@ -44,12 +51,19 @@ def _filter_out_empty_tasks(func=None):
 class TaskGraph(object):
     """
     Task graph builder.
+
+    :param name: name of the graph
+    :param backend: name of the backend storing the graph, one of :data:`BACKENDS` (defaults to
+     :data:`DEFAULT_BACKEND`)
     """
 
-    def __init__(self, name):
+    def __init__(self, name, backend=None):
         self.name = name
         self._id = generate_uuid(variant='uuid')
-        self._graph = DiGraph()
+        backend = backend or DEFAULT_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError(u'Unknown task graph backend: {0}'.format(backend))
+        self._graph = BACKENDS[backend]()
 
     def __repr__(self):
         return u'{name}(id={self._id}, name={self.name}, graph={self._graph!r})'.format(            # pylint: disable=redundant-keyword-arg
@@ -69,8 +83,8 @@ class TaskGraph(object):
         """
         Iterator over tasks in the graph.
         """
-        for _, data in self._graph.nodes(data=True):
-            yield data['task']
+        for task in self._graph.nodes():
+            yield task
 
     def topological_order(self, reverse=False):
         """
@@ -78,12 +92,14 @@ class TaskGraph(object):
 
         :param reverse: whether to reverse the sort
         :return: list which represents the topological sort
+        :raises ~aria.orchestrator.workflows.api.task_graph.TaskGraphCycleError: if the tasks
+         depend on each other in a cycle
         """
-        task_ids = topological_sort(self._graph)
+        tasks = self._graph.topological_sort()
         if reverse:
-            task_ids = reversed(tuple(task_ids))
-        for task_id in task_ids:
-            yield self.get_task(task_id)
+            tasks = reversed(tasks)
+        for task in tasks:
+            yield task
 
     def get_dependencies(self, dependent_task):
         """
@@ -95,8 +111,8 @@ class TaskGraph(object):
         """
         if not self.has_tasks(dependent_task):
             raise TaskNotInGraphError(u'Task id: {0}'.format(dependent_task.id))
-        for _, dependency_id in self._graph.out_edges(dependent_task.id):
-            yield self.get_task(dependency_id)
+        for dependency in self._graph.successors(dependent_task.id):
+            yield dependency
 
     def get_dependents(self, dependency_task):
         """
@@ -108,8 +124,8 @@ class TaskGraph(object):
         """
         if not self.has_tasks(dependency_task):
             raise TaskNotInGraphError(u'Task id: {0}'.format(dependency_task.id))
-        for dependent_id, _ in self._graph.in_edges(dependency_task.id):
-            yield self.get_task(dependent_id)
+        for dependent in self._graph.predecessors(dependency_task.id):
+            yield dependent
 
     # task methods
 
@@ -123,8 +139,7 @@ class TaskGraph(object):
         """
         if not self._graph.has_node(task_id):
             raise TaskNotInGraphError(u'Task id: {0}'.format(task_id))
-        data = self._graph.node[task_id]
-        return data['task']
+        return self._graph.get_node(task_id)
 
     @_filter_out_empty_tasks
     def add_tasks(self, *tasks):
@@ -142,7 +157,7 @@ class TaskGraph(object):
             if isinstance(task, Iterable):
                 return_tasks += self.add_tasks(*task)
             elif not self.has_tasks(task):
-                self._graph.add_node(task.id, task=task)
+                self._graph.add_node(task.id, task)
                 return_tasks.append(task)
 
         return return_tasks
@@ -296,3 +311,186 @@ class TaskGraph(object):
                 self.add_dependency(tasks[i], tasks[i-1])
 
         return tasks
+
+
+class _NativeGraph(object):
+    """
+    Compact directed graph of tasks, where an edge goes from a dependent task to its dependency.
+
+    Every task is given an integer index when it's added, and its edges are kept as arrays of the
+    indexes of its neighbours. The topological order is computed once, and kept until the graph is
+    modified.
+    """
+
+    # Typecode of the neighbours' indexes arrays
+    _INDEX_TYPECODE = 'l'
+    # Bits the index of the dependency is shifted by in an edge's key
+    _EDGE_KEY_SHIFT = 32
+
+    def __init__(self):
+        # Index of each task, by task ID
+        self._indexes = {}
+        # Tasks, by index (None for removed tasks)
+        self._tasks = []
+        # Indexes of the dependencies of each task, by index
+        self._successors = []
+        # Indexes of the dependents of each task, by index
+        self._predecessors = []
+        # Keys of all the edges, for checking whether an edge exists in constant time
+        self._edges = set()
+        self._order = None
+
+    def __repr__(self):
+        return '{name}(tasks={tasks}, dependencies={dependencies})'.format(
+            name=self.__class__.__name__, tasks=len(self._indexes), dependencies=len(self._edges))
+
+    def nodes(self):
+        return (task for task in self._tasks if task is not None)
+
+    def has_node(self, task_id):
+        return task_id in self._indexes
+
+    def get_node(self, task_id):
+        return self._tasks[self._indexes[task_id]]
+
+    def add_node(self, task_id, task):
+        self._indexes[task_id] = len(self._tasks)
+        self._tasks.append(task)
+        self._successors.append(array(self._INDEX_TYPECODE))
+        self._predecessors.append(array(self._INDEX_TYPECODE))
+        self._order = None
+
+    def remove_node(self, task_id):
+        index = self._indexes.pop(task_id)
+        for successor in self._successors[index]:
+            self._predecessors[successor].remove(index)
+            self._edges.discard(self._edge_key(index, successor))
+        for predecessor in self._predecessors[index]:
+            self._successors[predecessor].remove(index)
+            self._edges.discard(self._edge_key(predecessor, index))
+        # The index isn't reused, so the indexes of the other tasks stay valid
+        self._tasks[index] = None
+        self._successors[index] = array(self._INDEX_TYPECODE)
+        self._predecessors[index] = array(self._INDEX_TYPECODE)
+        self._order = None
+
+    def has_edge(self, from_task_id, to_task_id):
+        return self._edge_key(self._indexes[from_task_id],
+                              self._indexes[to_task_id]) in self._edges
+
+    def add_edge(self, from_task_id, to_task_id):
+        from_index, to_index = self._indexes[from_task_id], self._indexes[to_task_id]
+        key = self._edge_key(from_index, to_index)
+        if key not in self._edges:
+            self._edges.add(key)
+            self._successors[from_index].append(to_index)
+            self._predecessors[to_index].append(from_index)
+            self._order = None
+
+    def remove_edge(self, from_task_id, to_task_id):
+        from_index, to_index = self._indexes[from_task_id], self._indexes[to_task_id]
+        self._edges.remove(self._edge_key(from_index, to_index))
+        self._successors[from_index].remove(to_index)
+        self._predecessors[to_index].remove(from_index)
+        self._order = None
+
+    def successors(self, task_id):
+        return [self._tasks[index] for index in self._successors[self._indexes[task_id]]]
+
+    def predecessors(self, task_id):
+        return [self._tasks[index] for index in self._predecessors[self._indexes[task_id]]]
+
+    def topological_sort(self):
+        if self._order is None:
+            self._order = self._sort()
+        return [self._tasks[index] for index in self._order]
+
+    def _sort(self):
+        # Kahn's algorithm: a task is sorted once all the tasks pointing at it are
+        remaining = array(self._INDEX_TYPECODE, (len(predecessors)
+                                                 for predecessors in self._predecessors))
+        order = array(self._INDEX_TYPECODE, (index for index in xrange(len(self._tasks))
+                                             if self._tasks[index] is not None
+                                             and not remaining[index]))
+        position = 0
+        while position < len(order):
+            for successor in self._successors[order[position]]:
+                remaining[successor] -= 1
+                if not remaining[successor]:
+                    order.append(successor)
+            position += 1
+        if len(order) != len(self._indexes):
+            raise TaskGraphCycleError(u'Tasks depend on each other in a cycle')
+        return order
+
+    def _edge_key(self, from_index, to_index):
+        return (from_index << self._EDGE_KEY_SHIFT) | to_index
+
+
+class _NetworkxGraph(object):
+    """
+    Directed graph of tasks, stored in a :class:`networkx.DiGraph`, where an edge goes from a
+    dependent task to its dependency.
+
+    Requires the optional ``networkx`` package.
+    """
+
+    def __init__(self):
+        try:
+            import networkx
+        except ImportError:
+            raise ImportError('The networkx task graph backend requires the networkx package, '
+                              'which may be installed by: pip install apache-ariatosca[networkx]')
+        self._networkx = networkx
+        self._graph = networkx.DiGraph()
+
+    def __repr__(self):
+        return '{name}({graph!r})'.format(name=self.__class__.__name__, graph=self._graph)
+
+    def nodes(self):
+        return (data['task'] for _, data in self._graph.nodes(data=True))
+
+    def has_node(self, task_id):
+        return self._graph.has_node(task_id)
+
+    def get_node(self, task_id):
+        return self._graph.node[task_id]['task']
+
+    def add_node(self, task_id, task):
+        self._graph.add_node(task_id, task=task)
+
+    def remove_node(self, task_id):
+        self._graph.remove_node(task_id)
+
+    def has_edge(self, from_task_id, to_task_id):
+        return self._graph.has_edge(from_task_id, to_task_id)
+
+    def add_edge(self, from_task_id, to_task_id):
+        self._graph.add_edge(from_task_id, to_task_id)
+
+    def remove_edge(self, from_task_id, to_task_id):
+        self._graph.remove_edge(from_task_id, to_task_id)
+
+    def successors(self, task_id):
+        return [self.get_node(successor_id) for successor_id in self._graph.successors(task_id)]
+
+    def predecessors(self, task_id):
+        return [self.get_node(predecessor_id)
+                for predecessor_id in self._graph.predecessors(task_id)]
+
+    def topological_sort(self):
+        try:
+            return [self.get_node(task_id)
+                    for task_id in self._networkx.topological_sort(self._graph)]
+        except self._networkx.NetworkXUnfeasible as e:
+            raise TaskGraphCycleError(unicode(e))
+
+
+#: Task graph backends, by name
+BACKENDS = {
+    'native': _NativeGraph,
+    'networkx': _NetworkxGraph
+}
+
+#: Name of the backend used by task graphs by default
+DEFAULT_BACKEND = 'native'
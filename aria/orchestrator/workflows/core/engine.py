@@ -17,8 +17,15 @@
 Workflow execution.
 """
 
-import time
-from datetime import datetime
+import heapq
+import itertools
+import math
+import Queue
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 
 from aria import logger
 from aria.modeling import models
@@ -29,17 +36,74 @@ from .. import exceptions
 from ..executor.base import StubTaskExecutor
 # Import required so all signals are registered
 from . import events_handler                                                                        # pylint: disable=unused-import
+from . import write_behind
+
+
+# Upper bound for the time the engine sleeps without being notified of anything. This is merely a
+# safety net for state changes that are made behind the engine's back (e.g. by other processes).
+DEFAULT_MAX_WAIT_INTERVAL = 1
+
+# Interval between two checks of the status of an execution, for cancel requests which were not
+# made through this process's engine (e.g. by other processes)
+DEFAULT_CANCEL_CHECK_INTERVAL = 5
 
 
 class Engine(logger.LoggerMixin):
     """
     Executes workflows.
+
+    The engine does not poll the storage on a fixed interval; it sleeps until a task attempt ends, a
+    retrying task becomes due or a cancel request arrives.
+
+    A single engine may run several executions at the same time (each on its own thread), in which
+    case the executors and the concurrency limits are shared by all of them.
+
+    Tasks which exceed the concurrency limits stay queued in the engine until enough of the running
+    tasks end. Stub tasks do not count towards (nor are they held back by) these limits. When the
+    engine runs several executions, each of the executions competing for slots is guaranteed an
+    equal share of ``max_concurrency``.
+
+    Tasks are also held back while their executor applies back pressure (see
+    :meth:`~aria.orchestrator.workflows.executor.base.BaseExecutor.back_pressure`), e.g. since the
+    host is running out of memory. The reason is logged to the execution's log whenever it changes.
+
+    :param executors: executors to run the tasks with
+    :param max_concurrency: maximum number of tasks running at the same time, across all the
+     executions run by the engine (``None`` for no limit)
+    :param per_executor_limits: dict mapping executor classes to the maximum number of tasks running
+     on them at the same time, across all the executions run by the engine
+    :param max_wait_interval: maximum time (in seconds) to sleep between two passes when no
+     notification arrives
+    :param cancel_check_interval: minimum time (in seconds) between two checks of the execution's
+     status in the storage; cancel requests made through :meth:`cancel_execution` are noticed
+     immediately regardless
+    :param write_behind_interval: when set, the task transitions the engine does not act upon (tasks
+     being sent or started) are buffered for up to this long (in seconds) and stored together,
+     rather than committed one by one (see :mod:`~aria.orchestrator.workflows.core.write_behind`)
     """
 
     def __init__(self, *executors, **kwargs):
+        self._max_concurrency = kwargs.pop('max_concurrency', None)
+        self._per_executor_limits = kwargs.pop('per_executor_limits', None) or {}
+        self._max_wait_interval = kwargs.pop('max_wait_interval', DEFAULT_MAX_WAIT_INTERVAL)
+        self._cancel_check_interval = kwargs.pop('cancel_check_interval',
+                                                 DEFAULT_CANCEL_CHECK_INTERVAL)
+        self._write_behind_interval = kwargs.pop('write_behind_interval', None)
         super(Engine, self).__init__(**kwargs)
         self._executors = dict((e.__class__, e) for e in executors)
         self._executors.setdefault(StubTaskExecutor, StubTaskExecutor())
+        # Trackers of the executions currently run by the engine, by execution ID
+        self._trackers = {}
+        # IDs of the executions which have ready tasks held back by the concurrency limits
+        self._held_back = set()
+        self._slots_lock = threading.Lock()
+        # Back pressure reasons last logged, by execution ID and executor class
+        self._back_pressure_reasons = {}
+        # Queues of the notifications the executions wake up on, by execution ID
+        self._notification_queues = {}
+        # Contexts of the executions requested to be cancelled through request_cancel
+        self._cancel_requests = weakref.WeakSet()
+        self._cancel_requests_lock = threading.Lock()
 
     def execute(self, ctx, resuming=False, retry_failed=False):
         """
@@ -49,33 +113,143 @@ class Engine(logger.LoggerMixin):
             events.on_resume_workflow_signal.send(ctx, retry_failed=retry_failed)
 
         tasks_tracker = _TasksTracker(ctx)
+        cancel_monitor = _CancelMonitor(ctx, self._cancel_check_interval)
+        notifications = Queue.Queue()
+        self._trackers[ctx._execution_id] = tasks_tracker
+        self._notification_queues[ctx._execution_id] = notifications
+        state_buffer = write_behind.register(ctx._execution_id, self._write_behind_interval) \
+            if self._write_behind_interval is not None else None
 
         try:
             events.start_workflow_signal.send(ctx)
-            while True:
-                cancel = self._is_cancel(ctx)
-                if cancel:
-                    break
-                for task in tasks_tracker.ended_tasks:
-                    self._handle_ended_tasks(task)
-                    tasks_tracker.finished(task)
-                for task in tasks_tracker.executable_tasks:
-                    tasks_tracker.executing(task)
-                    self._handle_executable_task(ctx, task)
-                if tasks_tracker.all_tasks_consumed:
-                    break
-                else:
-                    time.sleep(0.1)
+            with self._notifications(ctx, notifications, cancel_monitor):
+                while True:
+                    self._flush_transitions(ctx, state_buffer, force=False)
+                    self._handle_cancel_request(ctx)
+                    cancel = cancel_monitor.is_cancelled()
+                    if cancel:
+                        break
+                    tasks_tracker.refresh()
+                    for task in tasks_tracker.ended_tasks:
+                        self._handle_ended_tasks(task)
+                        tasks_tracker.finished(task)
+                    self._execute_executable_tasks(ctx, tasks_tracker)
+                    if tasks_tracker.all_tasks_consumed:
+                        break
+                    else:
+                        self._wait(notifications, _earliest(
+                            tasks_tracker.next_due_at,
+                            state_buffer.flush_due_at if state_buffer is not None else None))
             if cancel:
                 self._terminate_tasks(tasks_tracker.executing_tasks)
+                self._flush_transitions(ctx, state_buffer)
                 events.on_cancelled_workflow_signal.send(ctx)
             else:
+                self._flush_transitions(ctx, state_buffer)
                 events.on_success_workflow_signal.send(ctx)
         except BaseException as e:
             # Cleanup any remaining tasks
             self._terminate_tasks(tasks_tracker.executing_tasks)
+            self._flush_transitions(ctx, state_buffer)
             events.on_failure_workflow_signal.send(ctx, exception=e)
             raise
+        finally:
+            if state_buffer is not None:
+                write_behind.unregister(ctx._execution_id)
+            self._forget_execution(ctx)
+
+    def _forget_execution(self, ctx):
+        del self._trackers[ctx._execution_id]
+        del self._notification_queues[ctx._execution_id]
+        with self._cancel_requests_lock:
+            self._cancel_requests.discard(ctx)
+        self._held_back.discard(ctx._execution_id)
+        for key in list(self._back_pressure_reasons):
+            if key[0] == ctx._execution_id:
+                del self._back_pressure_reasons[key]
+
+    def _execute_executable_tasks(self, ctx, tasks_tracker):
+        """
+        Executes the executable tasks for which there are slots, and records whether any of them
+        were held back.
+        """
+        held_back = False
+        for task in tasks_tracker.executable_tasks:
+            if not self._acquire_slot(ctx, tasks_tracker, task):
+                held_back = True
+                if self._is_saturated(tasks_tracker):
+                    break
+                continue
+            self._handle_executable_task(ctx, task)
+        if held_back:
+            self._held_back.add(ctx._execution_id)
+        else:
+            self._held_back.discard(ctx._execution_id)
+
+    def _acquire_slot(self, ctx, tasks_tracker, task):
+        """
+        Marks the task as executing, if the concurrency limits and the executor's back pressure
+        allow it.
+        """
+        executor = tasks_tracker.get_executor(task)
+        if executor is not None and self._is_back_pressured(ctx, executor):
+            return False
+        # The check and the marking must be atomic, as other executions might compete for the slot
+        with self._slots_lock:
+            if not self._has_free_slot(tasks_tracker, task):
+                return False
+            tasks_tracker.executing(task)
+            return True
+
+    def _has_free_slot(self, tasks_tracker, task):
+        executor = tasks_tracker.get_executor(task)
+        if executor is None:
+            # Stub tasks are not limited
+            return True
+        if self._is_saturated(tasks_tracker):
+            return False
+        executor_limit = self._per_executor_limits.get(executor)
+        return not executor_limit or sum(
+            tracker.running_tasks_count(executor) for tracker in self._trackers.values()) \
+            < executor_limit
+
+    def _is_back_pressured(self, ctx, executor):
+        reason = self._executors[executor].back_pressure()
+        key = (ctx._execution_id, executor)
+        # Logged only when the reason changes, since the check is made on every pass
+        if reason != self._back_pressure_reasons.get(key):
+            if reason:
+                ctx.logger.info(u'Holding back tasks of {0}: {1}'.format(executor.__name__, reason))
+            else:
+                ctx.logger.info(u'Resuming tasks of {0}'.format(executor.__name__))
+            self._back_pressure_reasons[key] = reason
+        return reason is not None
+
+    def _is_saturated(self, tasks_tracker):
+        if not self._max_concurrency:
+            return False
+        trackers = self._trackers.values()
+        if sum(tracker.running_tasks_count() for tracker in trackers) >= self._max_concurrency:
+            return True
+        # Executions which neither run tasks nor wait for slots don't take a share of the limit
+        competing_count = len([tracker for tracker in trackers
+                               if tracker is tasks_tracker or tracker.running_tasks_count()
+                               or tracker.execution_id in self._held_back])
+        fair_share = int(math.ceil(float(self._max_concurrency) / competing_count))
+        return tasks_tracker.running_tasks_count() >= fair_share
+
+    def _flush_transitions(self, ctx, state_buffer, force=True):
+        """
+        Stores the buffered task transitions, if any, and if they are due (or ``force`` is set, e.g.
+        since the execution ends).
+        """
+        if state_buffer is None:
+            return
+        try:
+            state_buffer.flush(ctx.model, force=force)
+        except Exception as e:
+            # The transitions are not worth failing the execution over
+            self.logger.warning(u'Failed to store the task transitions: {0}'.format(e))
 
     def _terminate_tasks(self, tasks):
         for task in tasks:
@@ -84,6 +258,44 @@ class Engine(logger.LoggerMixin):
             except BaseException:
                 pass
 
+    @contextmanager
+    def _notifications(self, ctx, notifications, cancel_monitor):
+        """
+        Pushes the events the engine should wake up on into ``notifications``, and cancel requests
+        into ``cancel_monitor``, for as long as the context is active.
+        """
+        def ended_task(op_ctx, *args, **kwargs):
+            if op_ctx._execution_id == ctx._execution_id:
+                notifications.put(op_ctx._task_id)
+            elif ctx._execution_id in self._held_back:
+                # The task of another execution might have freed a slot for the held back tasks
+                notifications.put(None)
+
+        def cancelling_workflow(workflow_context, *args, **kwargs):
+            if workflow_context._execution_id == ctx._execution_id:
+                cancel_monitor.requested()
+                notifications.put(None)
+
+        with events.ended_task_signal.connected_to(ended_task):
+            with events.on_cancelling_workflow_signal.connected_to(cancelling_workflow):
+                yield
+
+    def _wait(self, notifications, due_at=None):
+        """
+        Blocks until a notification arrives, ``due_at`` is reached or the maximum wait interval
+        elapses, whichever comes first. All pending notifications are consumed, since a single pass
+        of the engine handles all of them.
+        """
+        timeout = self._max_wait_interval
+        if due_at is not None:
+            timeout = max(min(timeout, (due_at - datetime.utcnow()).total_seconds()), 0)
+        try:
+            notifications.get(timeout=timeout)
+            while True:
+                notifications.get_nowait()
+        except Queue.Empty:
+            pass
+
     @staticmethod
     def cancel_execution(ctx):
         """
@@ -93,10 +305,27 @@ class Engine(logger.LoggerMixin):
         """
         events.on_cancelling_workflow_signal.send(ctx)
 
-    @staticmethod
-    def _is_cancel(ctx):
-        execution = ctx.model.execution.refresh(ctx.execution)
-        return execution.status in (models.Execution.CANCELLING, models.Execution.CANCELLED)
+    def request_cancel(self, ctx):
+        """
+        Requests an execution which this engine runs to be cancelled.
+
+        Unlike :meth:`cancel_execution`, the status of the execution is changed by the thread which
+        runs it, so the change can't be written over by the execution starting at the same time.
+
+        :param ctx: workflow context the execution is run with
+        """
+        with self._cancel_requests_lock:
+            self._cancel_requests.add(ctx)
+        notifications = self._notification_queues.get(ctx._execution_id)
+        if notifications is not None:
+            notifications.put(None)
+
+    def _handle_cancel_request(self, ctx):
+        with self._cancel_requests_lock:
+            if ctx not in self._cancel_requests:
+                return
+            self._cancel_requests.discard(ctx)
+        self.cancel_execution(ctx)
 
     def _handle_executable_task(self, ctx, task):
         task_executor = self._executors[task._executor]
@@ -124,62 +353,301 @@ class Engine(logger.LoggerMixin):
             raise exceptions.ExecutorException('Workflow failed')
 
 
+def _earliest(*times):
+    times = [t for t in times if t is not None]
+    return min(times) if times else None
+
+
+class _CancelMonitor(object):
+    """
+    Tells whether an execution was requested to be cancelled, without reloading the execution.
+
+    Only the status of the execution is queried, and at most once every ``check_interval`` seconds,
+    unless a cancel request was pushed through :meth:`requested`, in which case it is queried on
+    every check until the request is reflected in the storage.
+    """
+
+    def __init__(self, ctx, check_interval):
+        self._ctx = ctx
+        self._check_interval = timedelta(seconds=check_interval)
+        self._requested = False
+        self._next_check_at = None
+
+    def requested(self):
+        self._requested = True
+
+    def is_cancelled(self):
+        now = datetime.utcnow()
+        if not self._requested and self._next_check_at is not None and now < self._next_check_at:
+            return False
+        self._next_check_at = now + self._check_interval
+        status = self._ctx.model.execution.get(self._ctx._execution_id, include=['status']).status
+        return status in (models.Execution.CANCELLING, models.Execution.CANCELLED)
+
+
+_TaskState = namedtuple('_TaskState', 'status, due_at, attempts_count')
+
+# Weight (in seconds) of operation tasks without history, when prioritizing tasks
+_DEFAULT_TASK_WEIGHT = 1
+
+# Number of previous executions whose task durations are taken into account when prioritizing tasks
+_HISTORY_EXECUTIONS_COUNT = 5
+
+
+def _get_historical_durations(ctx, execution):
+    """
+    Average durations (in seconds) of the operation tasks of recent executions of the same workflow
+    on the same service, by task name.
+    """
+    previous_executions = ctx.model.execution.list(
+        include=['id'],
+        filters={'service_fk': execution.service_fk,
+                 'workflow_name': execution.workflow_name,
+                 'id': {'ne': execution.id}},
+        sort={'created_at': 'desc'},
+        pagination={'size': _HISTORY_EXECUTIONS_COUNT})
+    if not previous_executions:
+        return {}
+
+    durations = {}
+    for task in ctx.model.task.iter(
+            include=['name', 'started_at', 'ended_at'],
+            filters={'execution_fk': [e.id for e in previous_executions],
+                     'status': models.Task.SUCCESS,
+                     '_stub_type': None}):
+        if task.started_at and task.ended_at:
+            durations.setdefault(task.name, []).append(
+                (task.ended_at - task.started_at).total_seconds())
+    return dict((name, sum(values) / len(values)) for name, values in durations.iteritems())
+
+
 class _TasksTracker(object):
+    """
+    Tracks the tasks of an execution through their life cycle: blocked, ready, executing and
+    executed.
+
+    Readiness is tracked by keeping a count of the unfinished dependencies of every task, along with
+    a reverse index from each task to its dependents. Finishing a task decrements the counts of its
+    dependents, and those reaching zero are moved to the ready queue, so the dependencies of a task
+    are never re-examined.
+
+    Tasks which aren't due yet (usually tasks waiting to be retried) are kept in a min-heap ordered
+    by their due time, and are only moved to the ready queue once their time has come.
+
+    The ready queue is a priority queue: tasks on the critical path are executed first. The priority
+    of a task is the length of the longest path from it to the end of the workflow, where each
+    operation task weighs its average duration in previous executions of the same workflow on the
+    same service (or one second, if it has no history), and stub tasks weigh nothing.
+
+    The scheduling decisions are based on a snapshot of the status related columns of the tasks,
+    which is synchronized with the storage by :meth:`refresh`.
+    """
+
+    _STATE_COLUMNS = ('id', ) + _TaskState._fields
+    _NON_ENDED_STATUSES = (models.Task.PENDING, models.Task.RETRYING, models.Task.SENT,
+                           models.Task.STARTED)
 
     def __init__(self, ctx):
         self._ctx = ctx
 
-        self._tasks = ctx.execution.tasks
-        self._executed_tasks = [task for task in self._tasks if task.has_ended()]
-        self._executable_tasks = list(set(self._tasks) - set(self._executed_tasks))
-        self._executing_tasks = []
+        execution = ctx.execution
+        self._execution_id = execution.id
+        self._tasks = execution.tasks
+        self._executed_tasks = set(task.id for task in self._tasks if task.has_ended())
+        self._ready_tasks = {}
+        self._ready_queue = []
+        self._ready_sequence = itertools.count()
+        self._executing_tasks = OrderedDict()
+        self._pending_dependencies_count = {}
+        self._dependents = {}
+        self._states = {}
+        self._stub_tasks = set()
+        self._waiting_tasks = []
+        self._executors = {}
+        self._running_tasks = {}
+        # Guards the running tasks, which are counted by the threads of other executions
+        self._running_tasks_lock = threading.Lock()
+        self._names = {}
+        self._priorities = {}
+
+        for task in self._tasks:
+            if task.id in self._executed_tasks:
+                continue
+            self._states[task.id] = _TaskState(task.status, task.due_at, task.attempts_count)
+            if task._stub_type:
+                self._stub_tasks.add(task.id)
+            else:
+                self._executors[task.id] = task._executor
+                self._names[task.id] = task.name
+            pending_dependencies = [dependency for dependency in task.dependencies
+                                    if dependency.id not in self._executed_tasks]
+            for dependency in pending_dependencies:
+                self._dependents.setdefault(dependency.id, []).append(task)
+            self._pending_dependencies_count[task.id] = len(pending_dependencies)
+
+        self._prioritize(_get_historical_durations(ctx, execution))
+
+        for task in self._tasks:
+            if self._pending_dependencies_count.get(task.id) == 0:
+                self._schedule(task.id, task)
+
+    @property
+    def execution_id(self):
+        return self._execution_id
 
     @property
     def all_tasks_consumed(self):
         return len(self._executed_tasks) == len(self._tasks) and len(self._executing_tasks) == 0
 
+    def get_executor(self, task):
+        """
+        Executor class of the task, or ``None`` for stub tasks.
+        """
+        return self._executors.get(task.id)
+
+    def running_tasks_count(self, executor=None):
+        """
+        Number of non-stub tasks which were sent and haven't ended (nor are waiting to be retried).
+
+        :param executor: only count the tasks of this executor class
+        """
+        # May be called from the threads of other executions, while this execution's thread adds
+        # and removes running tasks
+        with self._running_tasks_lock:
+            if executor is not None:
+                return len(self._running_tasks.get(executor, ()))
+            return sum(len(task_ids) for task_ids in self._running_tasks.itervalues())
+
     def executing(self, task):
-        # Task executing could be retrying (thus removed and added earlier)
-        if task not in self._executing_tasks:
-            self._executable_tasks.remove(task)
-            self._executing_tasks.append(task)
+        # Task executing could be retrying (thus already added earlier)
+        del self._ready_tasks[task.id]
+        self._executing_tasks[task.id] = task
+        if task.id in self._executors:
+            with self._running_tasks_lock:
+                self._running_tasks.setdefault(self._executors[task.id], set()).add(task.id)
 
     def finished(self, task):
-        self._executing_tasks.remove(task)
-        self._executed_tasks.append(task)
+        self._stopped_running(task.id)
+        del self._executing_tasks[task.id]
+        del self._states[task.id]
+        self._executed_tasks.add(task.id)
+        for dependent in self._dependents.pop(task.id, ()):
+            self._pending_dependencies_count[dependent.id] -= 1
+            if not self._pending_dependencies_count[dependent.id]:
+                del self._pending_dependencies_count[dependent.id]
+                self._schedule(dependent.id, dependent)
+
+    def refresh(self):
+        """
+        Synchronizes the ready and executing tasks with the storage.
+
+        The status related columns of all the non-ended tasks of the execution are fetched in a
+        single query. Tasks are reloaded entirely only when they have ended or are waiting to be
+        retried, since that is when the engine acts upon them.
+        """
+        rows = self._ctx.model.task.list(
+            include=list(self._STATE_COLUMNS),
+            filters={'execution_fk': self._execution_id,
+                     'status': list(self._NON_ENDED_STATUSES)})
+        states = dict((row.id, _TaskState(row.status, row.due_at, row.attempts_count))
+                      for row in rows)
+
+        for task_id, task in self._ready_tasks.items() + self._executing_tasks.items():
+            state = states.get(task_id)
+            if state == self._states[task_id]:
+                continue
+            if state is None or self._is_waiting(task_id, state):
+                task = self._ctx.model.task.refresh(task, attributes=list(_TaskState._fields))
+                state = _TaskState(task.status, task.due_at, task.attempts_count)
+            self._states[task_id] = state
+            if self._is_waiting(task_id, state):
+                self._stopped_running(task_id)
+                self._schedule(task_id, task)
+
+    @property
+    def next_due_at(self):
+        """
+        Earliest due time of the tasks which aren't due yet, or ``None`` if there are no such tasks.
+        """
+        return self._waiting_tasks[0][0] if self._waiting_tasks else None
 
     @property
     def ended_tasks(self):
-        for task in self.executing_tasks:
-            if task.has_ended():
+        for task_id, task in self._executing_tasks.items():
+            if self._states[task_id].status in (models.Task.SUCCESS, models.Task.FAILED):
                 yield task
 
     @property
     def executable_tasks(self):
         now = datetime.utcnow()
-        # we need both lists since retrying task are in the executing task list.
-        for task in self._update_tasks(set(self._executing_tasks + self._executable_tasks)):
-            if all([task.is_waiting(),
-                    task.due_at <= now,
-                    all(dependency in self._executed_tasks for dependency in task.dependencies)
-                   ]):
-                yield task
+        while self._waiting_tasks and self._waiting_tasks[0][0] <= now:
+            _, task_id, task = heapq.heappop(self._waiting_tasks)
+            self._make_ready(task_id, task)
+
+        # Tasks are popped by priority; those which weren't passed to ``executing`` (e.g. due to
+        # concurrency limits, or because the iteration was stopped) are pushed back afterwards
+        skipped = []
+        try:
+            while self._ready_queue:
+                entry = heapq.heappop(self._ready_queue)
+                task_id = entry[-1]
+                skipped.append(entry)
+                if self._is_waiting(task_id, self._states[task_id]):
+                    yield self._ready_tasks[task_id]
+        finally:
+            for entry in skipped:
+                if entry[-1] in self._ready_tasks:
+                    heapq.heappush(self._ready_queue, entry)
 
     @property
     def executing_tasks(self):
-        for task in self._update_tasks(self._executing_tasks):
-            yield task
+        return self._executing_tasks.values()
 
-    @property
-    def executed_tasks(self):
-        for task in self._update_tasks(self._executed_tasks):
-            yield task
+    def _stopped_running(self, task_id):
+        if task_id in self._executors:
+            with self._running_tasks_lock:
+                self._running_tasks.get(self._executors[task_id], set()).discard(task_id)
 
-    @property
-    def tasks(self):
-        for task in self._update_tasks(self._tasks):
-            yield task
+    def _schedule(self, task_id, task):
+        due_at = self._states[task_id].due_at
+        if due_at > datetime.utcnow():
+            heapq.heappush(self._waiting_tasks, (due_at, task_id, task))
+        else:
+            self._make_ready(task_id, task)
 
-    def _update_tasks(self, tasks):
-        for task in tasks:
-            yield self._ctx.model.task.refresh(task)
+    def _make_ready(self, task_id, task):
+        if task_id not in self._ready_tasks:
+            self._ready_tasks[task_id] = task
+            heapq.heappush(self._ready_queue,
+                           (-self._priorities[task_id], next(self._ready_sequence), task_id))
+
+    def _prioritize(self, historical_durations):
+        """
+        Computes the length of the longest path from each unfinished task to the end of the
+        workflow, by going over the tasks in reverse topological order.
+        """
+        pending_dependencies_count = self._pending_dependencies_count.copy()
+        roots = [task_id for task_id, count in pending_dependencies_count.iteritems() if not count]
+        topological_order = []
+        while roots:
+            task_id = roots.pop()
+            topological_order.append(task_id)
+            for dependent in self._dependents.get(task_id, ()):
+                pending_dependencies_count[dependent.id] -= 1
+                if not pending_dependencies_count[dependent.id]:
+                    roots.append(dependent.id)
+
+        for task_id in reversed(topological_order):
+            if task_id in self._stub_tasks:
+                weight = 0
+            else:
+                weight = historical_durations.get(self._names[task_id], _DEFAULT_TASK_WEIGHT)
+            self._priorities[task_id] = weight + max(
+                [self._priorities[dependent.id] for dependent in self._dependents.get(task_id, ())]
+                or [0])
+
+    def _is_waiting(self, task_id, state):
+        # Mirrors models.Task.is_waiting, without touching the (possibly expired) task model
+        if task_id in self._stub_tasks:
+            return state.status not in (models.Task.SUCCESS, models.Task.FAILED)
+        return state.status in (models.Task.PENDING, models.Task.RETRYING)
@@ -24,11 +24,16 @@ from datetime import (
 
 from ... import events
 from ... import exceptions
+from . import write_behind
 
 
 @events.sent_task_signal.connect
 def _task_sent(ctx, *args, **kwargs):
     task = ctx.task
+    state_buffer = write_behind.get(ctx._execution_id)
+    if state_buffer is not None:
+        state_buffer.defer(task, status=task.SENT)
+        return
     task.status = ctx.task.SENT
     ctx.model.task.update(task)
 
@@ -36,14 +41,21 @@ def _task_sent(ctx, *args, **kwargs):
 @events.start_task_signal.connect
 def _task_started(ctx, *args, **kwargs):
     task = ctx.task
+    state_buffer = write_behind.get(ctx._execution_id)
+    if state_buffer is not None:
+        state_buffer.defer(task, started_at=datetime.utcnow(), status=task.STARTED)
+        _update_node_state_if_necessary(ctx, is_transitional=True, state_buffer=state_buffer)
+        return
     ctx.task.started_at = datetime.utcnow()
     ctx.task.status = ctx.task.STARTED
-    _update_node_state_if_necessary(ctx, is_transitional=True)
-    ctx.model.task.update(task)
+    with ctx.model.batch():
+        _update_node_state_if_necessary(ctx, is_transitional=True)
+        ctx.model.task.update(task)
 
 
 @events.on_failure_task_signal.connect
 def _task_failed(ctx, exception, *args, **kwargs):
+    _write_deferred_transitions(ctx)
     task = ctx.task
     should_retry = all([
         not isinstance(exception, exceptions.TaskAbortException),
@@ -67,17 +79,21 @@ def _task_failed(ctx, exception, *args, **kwargs):
         task.ended_at = datetime.utcnow()
         task.status = task.FAILED
     ctx.model.task.update(task)
+    events.ended_task_signal.send(ctx)
 
 
 @events.on_success_task_signal.connect
 def _task_succeeded(ctx, *args, **kwargs):
+    _write_deferred_transitions(ctx)
     task = ctx.task
     ctx.task.ended_at = datetime.utcnow()
     ctx.task.status = ctx.task.SUCCESS
     ctx.task.attempts_count += 1
 
-    _update_node_state_if_necessary(ctx)
-    ctx.model.task.update(task)
+    with ctx.model.batch():
+        _update_node_state_if_necessary(ctx)
+        ctx.model.task.update(task)
+    events.ended_task_signal.send(ctx)
 
 
 @events.start_workflow_signal.connect
@@ -154,7 +170,16 @@ def _workflow_cancelling(workflow_context, *args, **kwargs):
     workflow_context.model.execution.update(execution)
 
 
-def _update_node_state_if_necessary(ctx, is_transitional=False):
+def _write_deferred_transitions(ctx):
+    # Ending (or retrying) a task must be durable, and so must its earlier transitions by then.
+    # They are written (as part of the transaction the task's end is committed in) before the task
+    # is changed, so that they can't be written over its new values
+    state_buffer = write_behind.get(ctx._execution_id)
+    if state_buffer is not None:
+        state_buffer.write(ctx.model, ctx.task, ctx.task.node)
+
+
+def _update_node_state_if_necessary(ctx, is_transitional=False, state_buffer=None):
     # TODO: this is not the right way to check! the interface name is arbitrary
     # and also will *never* be the type name
     node = ctx.task.node if ctx.task is not None else None
@@ -163,7 +188,9 @@ def _update_node_state_if_necessary(ctx, is_transitional=False):
                                      'tosca:Standard')):
         state = node.determine_state(op_name=ctx.task.operation_name,
                                      is_transitional=is_transitional)
-        if state:
+        if state and state_buffer is not None:
+            state_buffer.defer(node, state=state)
+        elif state:
             node.state = state
             ctx.model.node.update(node)
 
@@ -0,0 +1,149 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compiled execution plans, and their cache.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from ....modeling import models
+
+
+DEFAULT_CACHE_SIZE = 32
+
+
+class ExecutionPlan(object):
+    """
+    Execution-independent copy of the tasks of a compiled workflow, from which the tasks of further
+    executions of the same workflow can be created without running the workflow function and
+    compiling its graph again.
+    """
+
+    # Task columns which are copied as is
+    _COLUMNS = ('name', 'max_attempts', 'retry_interval', 'ignore_failure', 'interface_name',
+                'operation_name', 'function', '_executor', '_context_cls', '_stub_type')
+
+    def __init__(self, tasks):
+        self._tasks = tasks
+
+    def __len__(self):
+        return len(self._tasks)
+
+    @classmethod
+    def from_tasks(cls, tasks):
+        """
+        Creates a plan from the (not yet stored) task models of a compiled workflow.
+
+        :param tasks: task models, such that every task comes after its dependencies
+        """
+        indexes = {}
+        plan_tasks = []
+        for index, task in enumerate(tasks):
+            indexes[task] = index
+            columns = dict((name, getattr(task, name)) for name in cls._COLUMNS)
+            columns['node_fk'] = task.node.id if task.node else None
+            columns['relationship_fk'] = task.relationship.id if task.relationship else None
+            columns['plugin_fk'] = task.plugin.id if task.plugin else None
+            arguments = [(argument.name, argument.type_name, argument._value, argument.description)
+                         for argument in task.arguments.itervalues()]
+            dependencies = [indexes[dependency] for dependency in task.dependencies]
+            plan_tasks.append((columns, arguments, dependencies))
+        return cls(plan_tasks)
+
+    def instantiate(self, execution):
+        """
+        Creates the task models of the plan for the execution. The tasks are attached to the
+        execution, and are stored along with it.
+        """
+        model_tasks = []
+        for columns, arguments, dependencies in self._tasks:
+            model_task = models.Task(
+                execution=execution,
+                dependencies=[model_tasks[index] for index in dependencies],
+                **columns)
+            for name, type_name, value, description in arguments:
+                argument = models.Argument.wrap(name, value, description)
+                # The type of the compiled argument, rather than the one guessed from its value
+                argument.type_name = type_name
+                model_task.arguments[name] = argument                                               # pylint: disable=unsubscriptable-object
+            model_tasks.append(model_task)
+        return model_tasks
+
+
+class ExecutionPlanCache(object):
+    """
+    Least recently used cache of execution plans.
+
+    :param size: maximum number of plans kept
+    """
+
+    def __init__(self, size=DEFAULT_CACHE_SIZE):
+        self._size = size
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the plan stored under ``key``, or ``None`` if there is no such plan.
+        """
+        with self._lock:
+            plan = self._plans.pop(key, None)
+            if plan is not None:
+                self._plans[key] = plan
+            return plan
+
+    def put(self, key, plan):
+        with self._lock:
+            self._plans.pop(key, None)
+            self._plans[key] = plan
+            while len(self._plans) > self._size:
+                self._plans.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+
+def service_fingerprint(service):
+    """
+    Digest of everything in the service which the tasks of the built-in workflows are derived from:
+    the nodes and their types, their relationships and their types, and the operations of both.
+    """
+    digest = hashlib.sha1()
+
+    def update(*values):
+        digest.update(repr(values))
+
+    def update_interfaces(interfaces):
+        for interface_name, interface in sorted(interfaces.iteritems()):
+            for operation_name, operation in sorted(interface.operations.iteritems()):
+                update(interface_name, operation_name, operation.function,
+                       operation.plugin.id if operation.plugin else None)
+                for argument_name, argument in sorted(operation.arguments.iteritems()):
+                    update(argument_name, argument.type_name, argument.value)
+
+    update(service.id)
+    for node in sorted(service.nodes.itervalues(), key=lambda n: n.id):
+        update('node', node.id, node.name, node.type.name)
+        update_interfaces(node.interfaces)
+        for relationship in node.outbound_relationships:
+            update('relationship', relationship.id, relationship.name,
+                   relationship.type.name if relationship.type else None,
+                   relationship.target_node.id)
+            update_interfaces(relationship.interfaces)
+    return digest.hexdigest()
@@ -14,16 +14,72 @@
 # limitations under the License.
 
 
+from collections import OrderedDict
+
 from ....modeling import models
 from .. import executor, api
+from .execution_plan import ExecutionPlan
+
+
+# Stub tasks which only delimit (sub)workflows or are placeholders, and may thus be elided
+_ELIDABLE_STUB_TYPES = (models.Task.START_SUBWROFKLOW, models.Task.END_SUBWORKFLOW,
+                        models.Task.STUB)
+
+# Transitive reduction needs memory quadratic in the number of tasks, so it is skipped for graphs
+# larger than this
+MAX_TRANSITIVE_REDUCTION_SIZE = 10000
+
+
+class _TaskSpec(object):
+    """
+    Task to be created: an operation task (if ``api_task`` is set) or a stub task.
+
+    The dependencies of a spec are either other specs, or task models which already exist.
+    """
+
+    def __init__(self, api_task=None, stub_type=None, name=None, dependencies=()):
+        self.api_task = api_task
+        self.stub_type = stub_type
+        self.name = name
+        self.dependencies = OrderedDict.fromkeys(dependencies)
 
 
 class GraphCompiler(object):
-    def __init__(self, ctx, default_executor):
+    """
+    Translates API task graphs into the task models of an execution.
+
+    The compiled tasks are indexed by the IDs of the API tasks (or the IDs of the workflow tasks'
+    end markers) they were created for, and the tasks which nothing depends on are tracked as the
+    tasks are created, so compiling is linear in the size of the graph. The task models are only
+    created once the whole graph has been compiled, and are stored in a single commit.
+
+    When optimizing, the graph is simplified before the task models are created, while keeping
+    the order in which the operations may run:
+
+    * Sub-workflow markers and stub tasks are elided, by making their dependents depend on their
+      dependencies instead, unless they join several tasks to several others (in which case
+      eliding them would multiply the dependencies).
+    * Dependencies which are implied by other dependencies are removed (transitive reduction).
+
+    :param ctx: workflow context
+    :param default_executor: executor class of the operation tasks
+    :param record_plan: whether to record the compiled tasks as an
+     :class:`~aria.orchestrator.workflows.core.execution_plan.ExecutionPlan` (see :attr:`plan`)
+    :param optimize: whether to simplify the graph before creating the task models
+    """
+
+    def __init__(self, ctx, default_executor, record_plan=False, optimize=False):
         self._ctx = ctx
         self._default_executor = default_executor
         self._stub_executor = executor.base.StubTaskExecutor
-        self._model_to_api_id = {}
+        self._record_plan = record_plan
+        self._optimize = optimize
+        self._api_id_to_spec = {}
+        self._api_id_to_model_task = {}
+        self._execution = None
+        self._non_dependent_tasks = None
+        self._specs = []
+        self.plan = None
 
     def compile(self,
                 task_graph,
@@ -37,6 +93,25 @@ class GraphCompiler(object):
         :param end_stub_type: internal use
         :param depends_on: internal use
         """
+        self._execution = self._ctx.execution
+        self._non_dependent_tasks = set(self._execution.tasks)
+        for task in self._execution.tasks:
+            self._non_dependent_tasks.difference_update(task.dependencies)
+
+        self._compile(task_graph, start_stub_type, end_stub_type, depends_on)
+        if self._optimize:
+            self._elide_stubs()
+            if len(self._specs) <= MAX_TRANSITIVE_REDUCTION_SIZE:
+                self._reduce_transitively()
+        model_tasks = self._create_model_tasks()
+        if self._record_plan:
+            # Must be done before storing the tasks, which expires them
+            self.plan = ExecutionPlan.from_tasks(model_tasks)
+
+        # The new tasks were attached to the execution, hence are stored along with it
+        self._ctx.model.execution.update(self._execution)
+
+    def _compile(self, task_graph, start_stub_type, end_stub_type, depends_on):
         depends_on = list(depends_on)
 
         # Insert start marker
@@ -54,7 +129,7 @@ class GraphCompiler(object):
 
             elif isinstance(task, api.task.WorkflowTask):
                 # Build the graph recursively while adding start and end markers
-                self.compile(
+                self._compile(
                     task, models.Task.START_SUBWROFKLOW, models.Task.END_SUBWORKFLOW, dependencies
                 )
             elif isinstance(task, api.task.StubTask):
@@ -65,28 +140,97 @@ class GraphCompiler(object):
         # Insert end marker
         self._create_stub_task(
             end_stub_type,
-            self._get_non_dependent_tasks(self._ctx.execution) or [start_task],
+            list(self._non_dependent_tasks) or [start_task],
             self._end_graph_suffix(task_graph.id),
             task_graph.name
         )
 
     def _create_stub_task(self, stub_type, dependencies, api_id, name=None):
-        model_task = models.Task(
-            name=name,
-            dependencies=dependencies,
-            execution=self._ctx.execution,
-            _executor=self._stub_executor,
-            _stub_type=stub_type)
-        self._ctx.model.task.put(model_task)
-        self._model_to_api_id[model_task.id] = api_id
-        return model_task
+        spec = _TaskSpec(stub_type=stub_type, name=name, dependencies=dependencies)
+        self._add_task(spec, api_id)
+        return spec
 
     def _create_operation_task(self, api_task, dependencies):
-        model_task = models.Task.from_api_task(
-            api_task, self._default_executor, dependencies=dependencies)
-        self._ctx.model.task.put(model_task)
-        self._model_to_api_id[model_task.id] = api_task.id
-        return model_task
+        spec = _TaskSpec(api_task=api_task, dependencies=dependencies)
+        self._add_task(spec, api_task.id)
+        return spec
+
+    def _add_task(self, spec, api_id):
+        self._api_id_to_spec[api_id] = spec
+        self._specs.append(spec)
+        self._non_dependent_tasks.difference_update(spec.dependencies)
+        self._non_dependent_tasks.add(spec)
+
+    def _elide_stubs(self):
+        dependents = {}
+        for spec in self._specs:
+            for dependency in spec.dependencies:
+                dependents.setdefault(dependency, OrderedDict())[spec] = None
+
+        elided = set()
+        for spec in self._specs:
+            spec_dependents = dependents.get(spec, {})
+            if spec.stub_type not in _ELIDABLE_STUB_TYPES or \
+                    (len(spec.dependencies) > 1 and len(spec_dependents) > 1):
+                continue
+            for dependency in spec.dependencies:
+                dependency_dependents = dependents.get(dependency)
+                if dependency_dependents is not None:
+                    del dependency_dependents[spec]
+            for dependent in spec_dependents:
+                del dependent.dependencies[spec]
+                for dependency in spec.dependencies:
+                    dependent.dependencies[dependency] = None
+                    dependents.setdefault(dependency, OrderedDict())[dependent] = None
+            dependents.pop(spec, None)
+            elided.add(spec)
+
+        if elided:
+            self._specs = [spec for spec in self._specs if spec not in elided]
+
+    def _reduce_transitively(self):
+        # The transitive dependencies of every task are kept as bit sets (one bit per task), and
+        # computed in topological order (which is the order the specs were created in)
+        bits = {}
+        transitive_dependencies = {}
+
+        def bit(task):
+            if task not in bits:
+                bits[task] = 1 << len(bits)
+            return bits[task]
+
+        for spec in self._specs:
+            implied = 0
+            for dependency in spec.dependencies:
+                implied |= transitive_dependencies.get(dependency, 0)
+            for dependency in [d for d in spec.dependencies if bit(d) & implied]:
+                del spec.dependencies[dependency]
+            transitive_dependencies[spec] = implied
+            for dependency in spec.dependencies:
+                transitive_dependencies[spec] |= bit(dependency)
+
+    def _create_model_tasks(self):
+        model_tasks = {}
+        for spec in self._specs:
+            dependencies = [model_tasks.get(dependency, dependency)
+                            for dependency in spec.dependencies]
+            if spec.api_task is not None:
+                model_task = models.Task.from_api_task(
+                    spec.api_task, self._default_executor, dependencies=dependencies,
+                    execution=self._execution)
+            else:
+                model_task = models.Task(
+                    name=spec.name,
+                    dependencies=dependencies,
+                    execution=self._execution,
+                    _executor=self._stub_executor,
+                    _stub_type=spec.stub_type)
+            model_tasks[spec] = model_task
+
+        for api_id, spec in self._api_id_to_spec.iteritems():
+            if spec in model_tasks:
+                self._api_id_to_model_task[api_id] = model_tasks[spec]
+        return [model_tasks[spec] for spec in self._specs]
 
     @staticmethod
     def _start_graph_suffix(api_id):
@@ -96,13 +240,6 @@ class GraphCompiler(object):
     def _end_graph_suffix(api_id):
         return u'{0}-End'.format(api_id)
 
-    @staticmethod
-    def _get_non_dependent_tasks(execution):
-        tasks_with_dependencies = set()
-        for task in execution.tasks:
-            tasks_with_dependencies.update(task.dependencies)
-        return list(set(execution.tasks) - set(tasks_with_dependencies))
-
     def _get_tasks_from_dependencies(self, dependencies):
         """
         Returns task list from dependencies.
@@ -113,6 +250,6 @@ class GraphCompiler(object):
                 dependency_name = dependency.id
             else:
                 dependency_name = self._end_graph_suffix(dependency.id)
-            tasks.extend(task for task in self._ctx.execution.tasks
-                         if self._model_to_api_id.get(task.id, None) == dependency_name)
+            if dependency_name in self._api_id_to_spec:
+                tasks.append(self._api_id_to_spec[dependency_name])
         return tasks
@@ -0,0 +1,140 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Write-behind buffering of task state transitions.
+
+Transitions which the engine does not act upon (a task being sent or started, and the transitional
+state of its node) are not committed right away. Instead, their column values are buffered, and
+written in a single transaction every ``interval`` seconds, at the end of the execution, or along
+with the next transition of the same task which must be durable (the task ending or being retried).
+Losing buffered transitions is harmless: resuming an execution puts all the non-ended tasks back to
+pending anyway.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm.attributes import flag_modified, set_committed_value
+
+# Buffers of the executions being run, by execution ID
+_buffers = {}
+
+
+
+def register(execution_id, interval):
+    """
+    Starts buffering the transitions of the execution's tasks.
+
+    :param execution_id: execution ID
+    :param interval: maximum time (in seconds) transitions are buffered for
+    """
+    _buffers[execution_id] = StateBuffer(interval)
+    return _buffers[execution_id]
+
+
+def unregister(execution_id):
+    """
+    Stops buffering the transitions of the execution's tasks; they should have been flushed.
+    """
+    _buffers.pop(execution_id, None)
+
+
+def get(execution_id):
+    """
+    Buffer of the execution's task transitions, or ``None`` if they are written right away.
+    """
+    return _buffers.get(execution_id)
+
+
+class StateBuffer(object):
+    """
+    Buffers column values of models, to be written later.
+
+    The buffered values are applied to the models as if they were loaded from the database, so that
+    they neither show up as changes of the models' sessions (which would write them, and hold the
+    database locked), nor are lost when the models are used. Once due, they are marked as changed
+    and written through the model storage, so versioned models are checked and bumped as usual.
+    """
+
+    def __init__(self, interval):
+        self._interval = timedelta(seconds=interval)
+        self._lock = threading.Lock()
+        # Models and their buffered values, by model class and ID
+        self._pending = OrderedDict()
+        self._flush_due_at = None
+
+    @property
+    def flush_due_at(self):
+        """
+        Time the buffered values are due to be flushed at, or ``None`` if there aren't any.
+        """
+        return self._flush_due_at
+
+    def defer(self, instance, **values):
+        """
+        Sets column values of a model, and buffers them.
+        """
+        for key, value in values.iteritems():
+            set_committed_value(instance, key, value)
+        with self._lock:
+            entry = self._pending.setdefault((type(instance), instance.id), (instance, {}))
+            entry[1].update(values)
+            if self._flush_due_at is None:
+                self._flush_due_at = datetime.utcnow() + self._interval
+
+    def write(self, model, *instances):                                                             # pylint: disable=unused-argument
+        """
+        Marks the buffered values of the models as changed, so that they are written as part of the
+        current transaction of the model storage, which the caller is expected to commit.
+        """
+        with self._lock:
+            entries = [self._pending.pop(key)
+                       for key in ((type(instance), instance.id) for instance in instances
+                                   if instance is not None)
+                       if key in self._pending]
+        _mark_changed(entries)
+
+    def flush(self, model, force=False):
+        """
+        Writes all the buffered values in a single transaction, if they are due (or ``force`` is
+        set).
+        """
+        # Swapped out under the lock, so that transitions of other threads aren't held while
+        # writing
+        with self._lock:
+            if self._flush_due_at is None or (not force and datetime.utcnow() < self._flush_due_at):
+                return
+            entries, self._pending = self._pending.values(), OrderedDict()
+            self._flush_due_at = None
+        if not entries:
+            # Already written along with durable transitions
+            return
+        instances_by_model = OrderedDict()
+        for instance, _ in entries:
+            instances_by_model.setdefault(type(instance), []).append(instance)
+        with model.batch():
+            _mark_changed(entries)
+            for model_cls, model_instances in instances_by_model.iteritems():
+                getattr(model, model_cls.__modelname__).update_many(model_instances)
+
+
+def _mark_changed(entries):
+    for instance, values in entries:
+        for key, value in values.iteritems():
+            # Values superseded by a transition written in the meantime are already stored
+            if getattr(instance, key) == value:
+                flag_modified(instance, key)
@@ -18,5 +18,5 @@ Task executors.
 """
 
 
-from . import process, thread
+from . import coroutine, process, thread
 from .base import BaseExecutor
@@ -0,0 +1,90 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Resource-aware admission control of tasks into executors.
+"""
+
+import threading
+import time
+
+import psutil
+
+
+# Minimum time (in seconds) between two samples of the host's resources
+DEFAULT_CHECK_INTERVAL = 1
+
+
+class AdmissionControl(object):
+    """
+    Tells whether an executor should stop admitting new tasks, since the resources of the host have
+    crossed a threshold.
+
+    The resources are sampled at most once every ``check_interval`` seconds, so checking for every
+    ready task is cheap.
+
+    :param max_cpu_percent: maximum system-wide CPU utilization (in percent)
+    :param min_available_memory: minimum memory (in bytes) available to new processes
+    :param max_open_files: maximum number of file descriptors (handles, on Windows) open by this
+     process
+    :param check_interval: minimum time (in seconds) between two samples of the resources
+    """
+
+    def __init__(self,
+                 max_cpu_percent=None,
+                 min_available_memory=None,
+                 max_open_files=None,
+                 check_interval=DEFAULT_CHECK_INTERVAL):
+        self._max_cpu_percent = max_cpu_percent
+        self._min_available_memory = min_available_memory
+        self._max_open_files = max_open_files
+        self._check_interval = check_interval
+        self._process = psutil.Process()
+        self._lock = threading.Lock()
+        self._next_check_at = None
+        self._reason = None
+        if max_cpu_percent is not None:
+            # The first sample only starts the measurement
+            psutil.cpu_percent(interval=None)
+
+    def check(self):
+        """
+        Reason for which new tasks should not be admitted at the moment, or ``None`` if they may be.
+        """
+        with self._lock:
+            now = time.time()
+            if self._next_check_at is None or now >= self._next_check_at:
+                self._reason = self._sample()
+                self._next_check_at = now + self._check_interval
+            return self._reason
+
+    def _sample(self):
+        if self._max_cpu_percent is not None:
+            cpu_percent = psutil.cpu_percent(interval=None)
+            if cpu_percent > self._max_cpu_percent:
+                return 'CPU utilization is {0:.1f}% (maximum is {1:.1f}%)'.format(
+                    cpu_percent, self._max_cpu_percent)
+        if self._min_available_memory is not None:
+            available_memory = psutil.virtual_memory().available
+            if available_memory < self._min_available_memory:
+                return 'available memory is {0:d} bytes (minimum is {1:d} bytes)'.format(
+                    available_memory, self._min_available_memory)
+        if self._max_open_files is not None:
+            open_files = self._process.num_fds() if hasattr(self._process, 'num_fds') \
+                else self._process.num_handles()
+            if open_files >= self._max_open_files:
+                return '{0:d} files are open (maximum is {1:d})'.format(
+                    open_files, self._max_open_files)
+        return None
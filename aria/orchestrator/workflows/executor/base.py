@@ -24,7 +24,14 @@ from aria.orchestrator import events
 class BaseExecutor(logger.LoggerMixin):
     """
     Base class for task executors.
+
+    :param admission_control: tells when the executor should stop admitting new tasks
+    :type admission_control: :class:`~.admission.AdmissionControl`
     """
+    def __init__(self, admission_control=None, *args, **kwargs):
+        super(BaseExecutor, self).__init__(*args, **kwargs)
+        self._admission_control = admission_control
+
     def _execute(self, ctx):
         raise NotImplementedError
 
@@ -43,6 +50,13 @@ class BaseExecutor(logger.LoggerMixin):
             self._task_started(ctx)
             self._task_succeeded(ctx)
 
+    def back_pressure(self):
+        """
+        Reason for which the executor does not admit new tasks at the moment, or ``None`` if it
+        does.
+        """
+        return self._admission_control.check() if self._admission_control else None
+
     def close(self):
         """
         Closes the executor.
@@ -68,9 +82,14 @@ class BaseExecutor(logger.LoggerMixin):
     def _task_succeeded(ctx):
         events.on_success_task_signal.send(ctx)
 
+    @staticmethod
+    def _task_ended(ctx):
+        events.ended_task_signal.send(ctx)
+
 
 class StubTaskExecutor(BaseExecutor):                                                               # pylint: disable=abstract-method
     def execute(self, ctx, *args, **kwargs):
         task = ctx.task
         task.status = ctx.task.SUCCESS
         ctx.model.task.update(task)
+        self._task_ended(ctx)
@@ -0,0 +1,270 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Coroutine task executor.
+
+Operation functions which are generators are run as coroutines on a single event loop thread. Each
+time they have to wait, they yield what they wait for, and other operations run in the meantime::
+
+    @operation
+    def wait_for_server(ctx, host, port, **_):
+        sock = socket.socket()
+        sock.setblocking(False)
+        sock.connect_ex((host, port))
+        yield coroutine.wait_writable(sock)
+        ...
+        yield coroutine.sleep(10)
+
+Operation functions which are not generators are run to completion on the event loop thread.
+"""
+
+import heapq
+import inspect
+import os
+import select
+import sys
+import threading
+import time
+import Queue
+from collections import (
+    deque,
+    namedtuple
+)
+
+from aria.utils import imports, exceptions
+
+from .base import BaseExecutor
+from ..exceptions import ExecutorException
+
+
+DEFAULT_CONCURRENCY = 1000
+
+_SLEEP = 'sleep'
+_READABLE = 'readable'
+_WRITABLE = 'writable'
+
+_Wait = namedtuple('_Wait', 'kind target')
+_Coroutine = namedtuple('_Coroutine', 'generator ctx')
+
+_POLL_ERRORS = select.POLLERR | select.POLLHUP | select.POLLNVAL if hasattr(select, 'poll') else 0
+
+
+def sleep(seconds):
+    """
+    Yielded by an operation to wait for a number of seconds.
+    """
+    return _Wait(_SLEEP, seconds)
+
+
+def wait_readable(fileobj):
+    """
+    Yielded by an operation to wait until a file object (or file descriptor) can be read from.
+    """
+    return _Wait(_READABLE, fileobj)
+
+
+def wait_writable(fileobj):
+    """
+    Yielded by an operation to wait until a file object (or file descriptor) can be written to.
+    """
+    return _Wait(_WRITABLE, fileobj)
+
+
+class CoroutineExecutor(BaseExecutor):
+    """
+    Coroutine task executor.
+
+    Suitable for operations which mostly wait on remote services, since thousands of them can wait
+    concurrently at the cost of a generator each, rather than a thread or a process each.
+
+    Note: This executor is incapable of running plugin operations, and requires ``select.poll``,
+    which is unavailable on Windows.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, close_timeout=5, *args, **kwargs):
+        """
+        :param concurrency: maximum number of operations running at the same time; further
+         operations are started as running ones end
+        :raises ~aria.orchestrator.workflows.exceptions.ExecutorException: if ``select.poll`` is
+         unavailable
+        """
+        if not hasattr(select, 'poll'):
+            raise ExecutorException('The coroutine executor requires select.poll, which is '
+                                    'unavailable on this platform')
+        super(CoroutineExecutor, self).__init__(*args, **kwargs)
+        self._concurrency = concurrency
+        self._close_timeout = close_timeout
+        self._stopped = False
+        self._queue = Queue.Queue()
+        self._pending = deque()
+        self._running = 0
+        # Coroutines to resume, with the value to send them or the exception to throw into them
+        self._ready = deque()
+        self._sleeping = []
+        # File descriptors to coroutines and the file objects they wait on
+        self._readers = {}
+        self._writers = {}
+        # Written to in order to wake the event loop up when tasks are queued or on close
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        self._loop_thread = threading.Thread(target=self._loop, name='CoroutineExecutor')
+        self._loop_thread.daemon = True
+        self._loop_thread.start()
+
+    def _execute(self, ctx):
+        self._queue.put(ctx)
+        self._wakeup()
+
+    def close(self):
+        self._stopped = True
+        self._wakeup()
+        if self._close_timeout is None:
+            self._loop_thread.join()
+        else:
+            self._loop_thread.join(self._close_timeout)
+        if not self._loop_thread.is_alive():
+            os.close(self._wakeup_read)
+            os.close(self._wakeup_write)
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_write, '\0')
+        except OSError:
+            pass
+
+    def _loop(self):
+        while not self._stopped:
+            try:
+                self._receive_tasks()
+                while self._pending and self._running < self._concurrency:
+                    self._start(self._pending.popleft())
+                # Coroutines which become ready while these run are resumed on the next iteration,
+                # so that they don't starve waiting ones
+                for _ in range(len(self._ready)):
+                    self._step(*self._ready.popleft())
+                self._wait()
+            # Errors of the operations are reported as their failures; this only keeps the daemon
+            # thread running
+            except BaseException as e:
+                self.logger.error(u'Error in coroutine executor loop: {0}'.format(e))
+
+    def _receive_tasks(self):
+        while True:
+            try:
+                self._pending.append(self._queue.get_nowait())
+            except Queue.Empty:
+                return
+
+    def _wait(self):
+        if self._ready or (self._pending and self._running < self._concurrency):
+            timeout = 0
+        elif self._sleeping:
+            timeout = max(0, self._sleeping[0][0] - time.time())
+        else:
+            timeout = None
+
+        poll = select.poll()
+        poll.register(self._wakeup_read, select.POLLIN)
+        for file_descriptor in set(self._readers).union(self._writers):
+            event_mask = (select.POLLIN if file_descriptor in self._readers else 0) | \
+                (select.POLLOUT if file_descriptor in self._writers else 0)
+            poll.register(file_descriptor, event_mask)
+        try:
+            events = poll.poll(None if timeout is None else timeout * 1000)
+        except select.error:
+            # Interrupted
+            events = []
+
+        for file_descriptor, event in events:
+            if file_descriptor == self._wakeup_read:
+                os.read(self._wakeup_read, 4096)
+                continue
+            # On errors, the operations get to find out about them when they use the file object
+            if file_descriptor in self._readers and event & (select.POLLIN | _POLL_ERRORS):
+                self._ready.append(self._readers.pop(file_descriptor) + (None,))
+            if file_descriptor in self._writers and event & (select.POLLOUT | _POLL_ERRORS):
+                self._ready.append(self._writers.pop(file_descriptor) + (None,))
+
+        now = time.time()
+        while self._sleeping and self._sleeping[0][0] <= now:
+            _, _, coroutine = heapq.heappop(self._sleeping)
+            self._ready.append((coroutine, None, None))
+
+    def _start(self, ctx):
+        self._running += 1
+        try:
+            self._task_started(ctx)
+            task_func = imports.load_attribute(ctx.task.function)
+            arguments = dict(arg.unwrapped for arg in ctx.task.arguments.itervalues())
+            result = task_func(ctx=ctx, **arguments)
+        except BaseException as e:
+            self._end(ctx, e, sys.exc_info())
+            return
+        if inspect.isgenerator(result):
+            self._ready.append((_Coroutine(result, ctx), None, None))
+        else:
+            self._end(ctx)
+
+    def _step(self, coroutine, value, exception):
+        try:
+            if exception is None:
+                wait = coroutine.generator.send(value)
+            else:
+                wait = coroutine.generator.throw(exception)
+        except StopIteration:
+            self._end(coroutine.ctx)
+            return
+        except BaseException as e:
+            self._end(coroutine.ctx, e, sys.exc_info())
+            return
+
+        try:
+            self._schedule(coroutine, wait)
+        except BaseException as e:
+            self._ready.append((coroutine, None, e))
+
+    def _schedule(self, coroutine, wait):
+        if wait is None:
+            # Only yields control to the other operations
+            self._ready.append((coroutine, None, None))
+        elif not isinstance(wait, _Wait):
+            raise TypeError('Operations can only yield None, sleep(), wait_readable() or '
+                            'wait_writable(), not {0!r}'.format(wait))
+        elif wait.kind == _SLEEP:
+            # The coroutine's id keeps coroutines which wake up at the same time from being compared
+            heapq.heappush(self._sleeping, (time.time() + wait.target, id(coroutine), coroutine))
+        else:
+            waiters = self._readers if wait.kind == _READABLE else self._writers
+            file_descriptor = wait.target if isinstance(wait.target, int) else wait.target.fileno()
+            if file_descriptor in waiters:
+                raise RuntimeError('Another operation is already waiting on {0!r}'
+                                   .format(wait.target))
+            waiters[file_descriptor] = (coroutine, wait.target)
+
+    def _end(self, ctx, exception=None, exc_info=None):
+        self._running -= 1
+        if exception is None:
+            try:
+                self._task_succeeded(ctx)
+                return
+            except BaseException as e:
+                exception, exc_info = e, sys.exc_info()
+        try:
+            self._task_failed(ctx,
+                              exception=exception,
+                              traceback=exceptions.get_exception_as_string(*exc_info))
+        except BaseException as e:
+            self.logger.error(u'Error reporting the failure of task {0}: {1}'
+                              .format(ctx.task.id, e))
@@ -53,3 +53,4 @@ class DryExecutor(base.BaseExecutor):
         task.ended_at = datetime.utcnow()
         task.status = task.SUCCESS
         ctx.model.task.update(task)
+        self._task_ended(ctx)
@@ -32,9 +32,10 @@ script_dir = os.path.dirname(__file__)
 if script_dir in sys.path:
     sys.path.remove(script_dir)
 
-import contextlib
 import io
 import threading
+import select
+import shutil
 import socket
 import struct
 import subprocess
@@ -48,6 +49,10 @@ import jsonpickle
 import aria
 from aria.orchestrator.workflows.executor import base
 from aria.extension import process_executor
+from aria.storage import (
+    proxy_mapi,
+    sql_mapi
+)
 from aria.utils import (
     imports,
     exceptions,
@@ -57,16 +62,56 @@ from aria.utils import (
 
 _INT_FMT = 'I'
 _INT_SIZE = struct.calcsize(_INT_FMT)
+# Messages sent by subprocesses start with their type and the length of their body, which is the
+# pickled ID of their task and payload
+_MESSAGE_HEADER_FMT = '!BI'
+_MESSAGE_HEADER_SIZE = struct.calcsize(_MESSAGE_HEADER_FMT)
+_MESSAGE_TYPES = ('closed', 'started', 'succeeded', 'failed', 'commit')
+_RECV_SIZE = 64 * 1024
 UPDATE_TRACKED_CHANGES_FAILED_STR = \
     'Some changes failed writing to storage. For more info refer to the log.'
 
+DEFAULT_MAX_TASKS_PER_WORKER = 100
+DEFAULT_LARGE_ARGUMENTS_SIZE = 1024 * 1024
+
+
+_Task = namedtuple('_Task', 'proc, ctx, worker')
 
-_Task = namedtuple('_Task', 'proc, ctx')
+ArgumentsSizeInfo = namedtuple('ArgumentsSizeInfo', 'tasks, total, max')
 
 
-class ProcessExecutor(base.BaseExecutor):
+class ProcessExecutor(base.BaseExecutor):                                                           # pylint: disable=too-many-instance-attributes
     """
     Sub-process task executor.
+
+    Tasks are sent to their subprocesses over their standard input. By default, every task is run
+    in a new subprocess. Alternatively, tasks may be run by a pool of long-lived worker
+    subprocesses, which saves starting the Python interpreter, importing ARIA and loading its
+    extensions for every task. Since a worker's environment is set up for the plugin of its first
+    task, a worker only runs tasks of that plugin (or tasks which don't belong to any plugin, if
+    its first task didn't either), and is replaced by a new one once it has run
+    ``max_tasks_per_worker`` tasks.
+
+    The environment of the subprocesses is prepared once per plugin, and is prepared again once the
+    plugin is reinstalled or the environment of this process changes.
+
+    With ``proxy_commits``, the subprocesses send the changes they commit to the model storage to
+    this executor, which writes them to the storage of their tasks' contexts, so the storage has a
+    single writer for all the subprocesses. Only commits are proxied: the subprocesses still open
+    their own connections to the model storage and read it directly, so they still need access to
+    the database.
+
+    :param plugin_manager: plugin manager, for loading the plugins of the tasks
+    :param python_path: additional directories to add to the Python path of the subprocesses
+    :param strict_loading: whether to take the versions of the extensions' dependencies into
+     account when loading them
+    :param pool_size: number of idle workers kept for running further tasks; if ``0``, tasks aren't
+     run by workers, but every task is run in a new subprocess
+    :param max_tasks_per_worker: number of tasks a worker runs before it is replaced
+    :param large_arguments_size: size in bytes of the serialized arguments of a task, above which
+     a warning is logged
+    :param proxy_commits: whether the subprocesses commit changes to the model storage through
+     this executor
     """
 
     def __init__(
@@ -74,12 +119,31 @@ class ProcessExecutor(base.BaseExecutor):
             plugin_manager=None,
             python_path=None,
             strict_loading=True,
+            pool_size=0,
+            max_tasks_per_worker=DEFAULT_MAX_TASKS_PER_WORKER,
+            large_arguments_size=DEFAULT_LARGE_ARGUMENTS_SIZE,
+            proxy_commits=False,
             *args,
             **kwargs
     ):
         super(ProcessExecutor, self).__init__(*args, **kwargs)
         self._plugin_manager = plugin_manager
         self._strict_loading = strict_loading
+        self._pool_size = pool_size
+        self._max_tasks_per_worker = max_tasks_per_worker
+        self._large_arguments_size = large_arguments_size
+        self._proxy_commits = proxy_commits
+        self._arguments_size_info = ArgumentsSizeInfo(tasks=0, total=0, max=0)
+
+        # Idle workers, the most recently used last
+        self._idle_workers = []
+        self._workers_lock = threading.Lock()
+
+        # Subprocess environments by the keys of their plugins, prepared from a copy of this
+        # process's environment
+        self._environments = {}
+        self._environ = None
+        self._environments_lock = threading.Lock()
 
         # Optional list of additional directories that should be added to
         # subprocesses python path
@@ -95,16 +159,12 @@ class ProcessExecutor(base.BaseExecutor):
             'started': self._handle_task_started_request,
             'succeeded': self._handle_task_succeeded_request,
             'failed': self._handle_task_failed_request,
+            'commit': self._handle_commit_request,
         }
 
-        # Server socket used to accept task status messages from subprocesses
-        self._server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._server_socket.bind(('localhost', 0))
-        self._server_socket.listen(10)
-        self._server_port = self._server_socket.getsockname()[1]
-
-        # Used to send a "closed" message to the listener when this executor is closed
-        self._messenger = _Messenger(task_id=None, port=self._server_port)
+        # Server socket used to accept the connections over which subprocesses send task status
+        # messages. Every subprocess keeps its connection for all the tasks it runs.
+        self._server_socket, self._server_address, self._server_dir = _create_server_socket()
 
         # Queue object used by the listener thread to notify this constructed it has started
         # (see last line of this __init__ method)
@@ -118,20 +178,42 @@ class ProcessExecutor(base.BaseExecutor):
         # Wait for listener thread to actually start before returning
         self._listener_started.get(timeout=60)
 
+    @property
+    def arguments_size_info(self):
+        """
+        Number of tasks sent to subprocesses, along with the total and maximal size in bytes of
+        their serialized arguments.
+
+        :rtype: :class:`ArgumentsSizeInfo`
+        """
+        return self._arguments_size_info
+
     def close(self):
         if self._stopped:
             return
         self._stopped = True
-        # Listener thread may be blocked on "accept" call. This will wake it up with an explicit
+        # Listener thread may be blocked on "select" call. This will wake it up with an explicit
         # "closed" message
-        self._messenger.closed()
-        self._server_socket.close()
+        channel = _Channel(self._server_address)
+        try:
+            channel.send('closed')
+        finally:
+            channel.close()
         self._listener_thread.join(timeout=60)
+        self._server_socket.close()
+        if self._server_dir:
+            shutil.rmtree(self._server_dir, ignore_errors=True)
 
         # we use set(self._tasks) since tasks may change in the process of closing
         for task_id in set(self._tasks):
             self.terminate(task_id)
 
+        with self._workers_lock:
+            idle_workers, self._idle_workers = self._idle_workers, []
+        for worker in idle_workers:
+            worker.stop()
+            worker.proc.wait()
+
     def terminate(self, task_id):
         task = self._remove_task(task_id)
         # The process might have managed to finish, thus it would not be in the tasks list
@@ -150,23 +232,61 @@ class ProcessExecutor(base.BaseExecutor):
     def _execute(self, ctx):
         self._check_closed()
 
-        # Temporary file used to pass arguments to the started subprocess
-        file_descriptor, arguments_json_path = tempfile.mkstemp(prefix='executor-', suffix='.json')
-        os.close(file_descriptor)
-        with open(arguments_json_path, 'wb') as f:
-            f.write(pickle.dumps(self._create_arguments_dict(ctx)))
+        data = pickle.dumps(self._create_arguments_dict(ctx), pickle.HIGHEST_PROTOCOL)
+        self._record_arguments_size(ctx, len(data))
 
-        env = self._construct_subprocess_env(task=ctx.task)
-        # Asynchronously start the operation in a subprocess
-        proc = subprocess.Popen(
-            [
-                sys.executable,
-                os.path.expanduser(os.path.expandvars(__file__)),
-                os.path.expanduser(os.path.expandvars(arguments_json_path))
-            ],
-            env=env)
-
-        self._tasks[ctx.task.id] = _Task(ctx=ctx, proc=proc)
+        env_key, env = self._get_subprocess_env(ctx.task)
+        if self._pool_size:
+            worker = self._acquire_worker(env_key, env)
+            try:
+                self._run_in_worker(ctx, data, worker)
+            except (IOError, OSError):
+                # The idle worker has exited meanwhile
+                self._remove_task(ctx.task.id)
+                self._run_in_worker(ctx, data, self._create_worker(env_key, env))
+        else:
+            # The task is run by a worker of its own, which exits right after it
+            worker = self._create_worker(env_key, env)
+            self._run_in_worker(ctx, data, worker, pooled=False)
+            worker.stop()
+
+    def _run_in_worker(self, ctx, data, worker, pooled=True):
+        # The task is tracked before the worker gets it, since an idle worker may report the task
+        # has started right away
+        self._tasks[ctx.task.id] = _Task(ctx=ctx,
+                                         proc=worker.proc,
+                                         worker=worker if pooled else None)
+        worker.run(data)
+
+    def _record_arguments_size(self, ctx, size):
+        info = self._arguments_size_info
+        self._arguments_size_info = ArgumentsSizeInfo(tasks=info.tasks + 1,
+                                                      total=info.total + size,
+                                                      max=max(info.max, size))
+        if size > self._large_arguments_size:
+            self.logger.warning(u'Arguments of task {0} take {1} bytes'.format(ctx.task.name, size))
+
+    def _acquire_worker(self, env_key, env):
+        with self._workers_lock:
+            for worker in list(reversed(self._idle_workers)):
+                if worker.env_key == env_key:
+                    self._idle_workers.remove(worker)
+                    if worker.proc.poll() is None:
+                        return worker
+        return self._create_worker(env_key, env)
+
+    def _create_worker(self, env_key, env):
+        return _Worker(env_key=env_key, env=env, strict_loading=self._strict_loading)
+
+    def _release_worker(self, worker):
+        if self._stopped or worker.tasks_count >= self._max_tasks_per_worker:
+            worker.stop()
+            return
+        with self._workers_lock:
+            self._idle_workers.append(worker)
+            while len(self._idle_workers) > self._pool_size:
+                # Workers of plugins which haven't been used lately make room for the others
+                self._idle_workers.pop(0).stop()
 
     def _remove_task(self, task_id):
         return self._tasks.pop(task_id, None)
@@ -180,13 +300,34 @@ class ProcessExecutor(base.BaseExecutor):
             'task_id': ctx.task.id,
             'function': ctx.task.function,
             'operation_arguments': dict(arg.unwrapped for arg in ctx.task.arguments.itervalues()),
-            'port': self._server_port,
+            'address': self._server_address,
             'context': ctx.serialization_dict,
-            'strict_loading': self._strict_loading
+            'strict_loading': self._strict_loading,
+            'proxy_commits': self._proxy_commits
         }
 
+    def _get_subprocess_env(self, task):
+        """
+        Returns the key of the subprocess environment of the task, along with the environment.
+        """
+        if task.plugin_fk and self._plugin_manager:
+            # A reinstalled plugin is uploaded anew
+            plugin = task.plugin
+            env_key = (plugin.id, plugin.uploaded_at)
+        else:
+            env_key = None
+
+        with self._environments_lock:
+            if os.environ != self._environ:
+                self._environments.clear()
+                self._environ = os.environ.copy()
+            env = self._environments.get(env_key)
+            if env is None:
+                env = self._environments[env_key] = self._construct_subprocess_env(task=task)
+        return env_key, env
+
     def _construct_subprocess_env(self, task):
-        env = os.environ.copy()
+        env = self._environ.copy()
 
         if task.plugin_fk and self._plugin_manager:
             # If this is a plugin operation,
@@ -202,69 +343,129 @@ class ProcessExecutor(base.BaseExecutor):
     def _listener(self):
         # Notify __init__ method this thread has actually started
         self._listener_started.put(True)
-        while not self._stopped:
-            try:
-                with self._accept_request() as (request, response):
-                    request_type = request['type']
-                    if request_type == 'closed':
-                        break
-                    request_handler = self._request_handlers.get(request_type)
-                    if not request_handler:
-                        raise RuntimeError(u'Invalid request type: {0}'.format(request_type))
-                    task_id = request['task_id']
-                    request_handler(task_id=task_id, request=request, response=response)
-            except BaseException as e:
-                self.logger.debug(u'Error in process executor listener: {0}'.format(e))
+        # Data received over every connection which doesn't make a whole message yet
+        connections = {}
+        try:
+            # Runs until the "closed" message
+            while True:
+                readable = select.select([self._server_socket] + connections.keys(), [], [])[0]
+                for connection in readable:
+                    if connection is self._server_socket:
+                        connections[connection.accept()[0]] = ''
+                        continue
+                    try:
+                        data = connection.recv(_RECV_SIZE)
+                    except socket.error:
+                        data = None
+                    if not data:
+                        # The subprocess has exited
+                        del connections[connection]
+                        connection.close()
+                        continue
+                    connections[connection] = self._handle_messages(
+                        connection, connections[connection] + data)
+        except _ListenerClosed:
+            pass
+        except BaseException as e:
+            self.logger.debug(u'Error in process executor listener: {0}'.format(e))
+        finally:
+            for connection in connections:
+                connection.close()
+
+    def _handle_messages(self, connection, data):
+        """
+        Handles the whole messages at the start of the data, and returns the rest of it.
+        """
+        while len(data) >= _MESSAGE_HEADER_SIZE:
+            message_type, body_size = struct.unpack(_MESSAGE_HEADER_FMT,
+                                                    data[:_MESSAGE_HEADER_SIZE])
+            message_size = _MESSAGE_HEADER_SIZE + body_size
+            if len(data) < message_size:
+                break
+            body, data = data[_MESSAGE_HEADER_SIZE:message_size], data[message_size:]
+
+            request_type = _MESSAGE_TYPES[message_type]
+            if request_type == 'closed':
+                raise _ListenerClosed()
 
-    @contextlib.contextmanager
-    def _accept_request(self):
-        with contextlib.closing(self._server_socket.accept()[0]) as connection:
-            message = _recv_message(connection)
-            response = {}
             try:
-                yield message, response
+                task_id, payload = pickle.loads(body)
+                self._request_handlers[request_type](
+                    task_id=task_id, connection=connection, payload=payload)
             except BaseException as e:
-                response['exception'] = exceptions.wrap_if_needed(e)
-                raise
-            finally:
-                _send_message(connection, response)
+                self.logger.debug(u'Error in process executor listener: {0}'.format(e))
+        return data
 
-    def _handle_task_started_request(self, task_id, **kwargs):
-        self._task_started(self._tasks[task_id].ctx)
+    def _handle_task_started_request(self, task_id, connection, **kwargs):
+        # The subprocess waits for the task to be marked as started before running it
+        try:
+            self._task_started(self._tasks[task_id].ctx)
+        except BaseException as e:
+            _send_reply(connection, exception=e)
+            raise
+        _send_reply(connection)
 
     def _handle_task_succeeded_request(self, task_id, **kwargs):
         task = self._remove_task(task_id)
         if task:
+            if task.worker:
+                self._release_worker(task.worker)
             self._task_succeeded(task.ctx)
 
-    def _handle_task_failed_request(self, task_id, request, **kwargs):
+    def _handle_task_failed_request(self, task_id, payload, **kwargs):
         task = self._remove_task(task_id)
         if task:
+            if task.worker:
+                self._release_worker(task.worker)
+            request = jsonpickle.loads(payload)
             self._task_failed(
                 task.ctx, exception=request['exception'], traceback=request['traceback'])
 
 
-def _send_message(connection, message):
+    def _handle_commit_request(self, task_id, connection, payload, **kwargs):
+        # Changes are written by the listener thread, one subprocess after the other
+        try:
+            session = self._tasks[task_id].ctx.model._all_api_kwargs['session']
+            identities = proxy_mapi.apply_changes(session, payload)
+        except BaseException as e:
+            _send_reply(connection, exception=e)
+            raise
+        _send_reply(connection, result=identities)
+
+
+class _ListenerClosed(Exception):
+    pass
+
 
-    # Packing the length of the entire msg using struct.pack.
-    # This enables later reading of the content.
-    def _pack(data):
-        return struct.pack(_INT_FMT, len(data))
+def _create_server_socket():
+    if hasattr(socket, 'AF_UNIX'):
+        server_dir = tempfile.mkdtemp(prefix='aria-executor-')
+        address = os.path.join(server_dir, 'listener.sock')
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server_socket.bind(address)
+    else:
+        server_dir = None
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.bind(('localhost', 0))
+        address = server_socket.getsockname()
+    server_socket.listen(10)
+    return server_socket, address, server_dir
 
-    data = jsonpickle.dumps(message)
-    msg_metadata = _pack(data)
-    connection.send(msg_metadata)
-    connection.sendall(data)
 
+def _send_reply(connection, result=None, exception=None):
+    data = jsonpickle.dumps({
+        'result': result,
+        'exception': exceptions.wrap_if_needed(exception) if exception else None
+    })
+    connection.sendall(struct.pack(_INT_FMT, len(data)) + data)
 
-def _recv_message(connection):
-    # Retrieving the length of the msg to come.
-    def _unpack(conn):
-        return struct.unpack(_INT_FMT, _recv_bytes(conn, _INT_SIZE))[0]
 
-    msg_metadata_len = _unpack(connection)
-    msg = _recv_bytes(connection, msg_metadata_len)
-    return jsonpickle.loads(msg)
+def _recv_reply(connection):
+    reply = jsonpickle.loads(
+        _recv_bytes(connection, struct.unpack(_INT_FMT, _recv_bytes(connection, _INT_SIZE))[0]))
+    if reply['exception']:
+        raise reply['exception']
+    return reply['result']
 
 
 def _recv_bytes(connection, count):
@@ -279,64 +480,159 @@ def _recv_bytes(connection, count):
         count -= len(read)
 
 
+class _Worker(object):
+    """
+    Subprocess running the tasks it is sent over its standard input one by one.
+    """
+
+    def __init__(self, env_key, env, strict_loading):
+        self.env_key = env_key
+        self.tasks_count = 0
+        self.proc = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.expanduser(os.path.expandvars(__file__)),
+                str(strict_loading)
+            ],
+            env=env,
+            stdin=subprocess.PIPE)
+
+    def run(self, data):
+        """
+        Sends the worker the pickled arguments of a task to run.
+        """
+        self.proc.stdin.write(struct.pack(_INT_FMT, len(data)) + data)
+        self.proc.stdin.flush()
+        self.tasks_count += 1
+
+    def stop(self):
+        """
+        Lets the worker exit once it's done with its current task.
+        """
+        try:
+            self.proc.stdin.close()
+        except (IOError, OSError):
+            pass
+
+
+class _Channel(object):
+    """
+    Connection of a subprocess to the listener of the executor, over which it sends the status
+    messages of all the tasks it runs.
+    """
+
+    def __init__(self, address):
+        family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.connect(address)
+        # Requests may be sent by several threads of the task, e.g. by the ctx proxy
+        self._lock = threading.Lock()
+
+    def send(self, message_type, task_id=None, payload=''):
+        with self._lock:
+            self._send(message_type, task_id, payload)
+
+    def request(self, message_type, task_id=None, payload=''):
+        """
+        Sends a message, and returns the result the listener replies with.
+        """
+        with self._lock:
+            self._send(message_type, task_id, payload)
+            return _recv_reply(self._socket)
+
+    def _send(self, message_type, task_id, payload):
+        body = pickle.dumps((task_id, payload), pickle.HIGHEST_PROTOCOL)
+        self._socket.sendall(
+            struct.pack(_MESSAGE_HEADER_FMT, _MESSAGE_TYPES.index(message_type), len(body)) + body)
+
+    def close(self):
+        self._socket.close()
+
+
 class _Messenger(object):
 
-    def __init__(self, task_id, port):
+    def __init__(self, task_id, channel):
         self.task_id = task_id
-        self.port = port
+        self.channel = channel
 
     def started(self):
         """Task started message"""
-        self._send_message(type='started')
+        self.channel.request('started', self.task_id)
 
     def succeeded(self):
         """Task succeeded message"""
-        self._send_message(type='succeeded')
+        self.channel.send('succeeded', self.task_id)
 
     def failed(self, exception):
         """Task failed message"""
-        self._send_message(type='failed', exception=exception)
+        self.channel.send('failed', self.task_id, jsonpickle.dumps({
+            'exception': exceptions.wrap_if_needed(exception),
+            'traceback': exceptions.get_exception_as_string(*sys.exc_info()),
+        }))
 
-    def closed(self):
-        """Executor closed message"""
-        self._send_message(type='closed')
-
-    def _send_message(self, type, exception=None):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect(('localhost', self.port))
-        try:
-            _send_message(sock, {
-                'type': type,
-                'task_id': self.task_id,
-                'exception': exceptions.wrap_if_needed(exception),
-                'traceback': exceptions.get_exception_as_string(*sys.exc_info()),
-            })
-            response = _recv_message(sock)
-            response_exception = response.get('exception')
-            if response_exception:
-                raise response_exception
-        finally:
-            sock.close()
+    def commit(self, changes):
+        """Changes to commit to the model storage"""
+        return self.channel.request('commit', self.task_id, changes)
 
 
 def _main():
-    arguments_json_path = sys.argv[1]
-    with open(arguments_json_path) as f:
-        arguments = pickle.loads(f.read())
+    _worker_main(strict_loading=sys.argv[1] == str(True))
+
+
+def _worker_main(strict_loading):
+    # Tasks are read from a private copy of the standard input, so that the processes started by
+    # the tasks can't consume them
+    tasks = os.fdopen(os.dup(sys.stdin.fileno()), 'rb')
+    null_fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null_fd, sys.stdin.fileno())
+    os.close(null_fd)
+
+    # Loaded along with the first task, once its arguments are read, so that the executor doesn't
+    # wait for the extensions to be loaded while sending them
+    install_extensions = None
+
+    # Restored after every task, so that tasks don't affect each other through them
+    cwd = os.getcwd()
+    environ = os.environ.copy()
 
-    # arguments_json_path is a temporary file created by the parent process.
-    # so we remove it here
-    os.remove(arguments_json_path)
+    # Connected on the first task, and kept for all the following ones
+    channel = None
 
+    while True:
+        length = tasks.read(_INT_SIZE)
+        if len(length) < _INT_SIZE:
+            # The executor is done with this worker
+            return
+        arguments = pickle.loads(tasks.read(struct.unpack(_INT_FMT, length)[0]))
+        if install_extensions is None:
+            try:
+                aria.install_aria_extensions(strict_loading)
+                install_extensions = False
+            except BaseException:
+                # Every task will try loading the extensions again, and report the failure
+                install_extensions = True
+        if channel is None:
+            channel = _Channel(arguments['address'])
+        try:
+            _run_task(arguments, channel, install_extensions=install_extensions)
+        finally:
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(environ)
+
+
+def _run_task(arguments, channel, install_extensions=True):
     task_id = arguments['task_id']
-    port = arguments['port']
-    messenger = _Messenger(task_id=task_id, port=port)
+    messenger = _Messenger(task_id=task_id, channel=channel)
 
     function = arguments['function']
     operation_arguments = arguments['operation_arguments']
     context_dict = arguments['context']
     strict_loading = arguments['strict_loading']
 
+    if arguments['proxy_commits']:
+        _proxy_model_storage(context_dict['context'], messenger)
+
     try:
         ctx = context_dict['context_cls'].instantiate_from_dict(**context_dict['context'])
     except BaseException as e:
@@ -346,7 +642,11 @@ def _main():
     try:
         messenger.started()
         task_func = imports.load_attribute(function)
-        aria.install_aria_extensions(strict_loading)
+        if install_extensions:
+            aria.install_aria_extensions(strict_loading)
+        else:
+            # The module of the function may have registered extensions
+            process_executor.init()
         for decorate in process_executor.decorate():
             task_func = decorate(task_func)
         task_func(ctx=ctx, **operation_arguments)
@@ -356,5 +656,14 @@ def _main():
         ctx.close()
         messenger.failed(e)
 
+
+def _proxy_model_storage(context_kwargs, messenger):
+    model_storage = context_kwargs.get('model_storage')
+    if model_storage and issubclass(model_storage['api'], sql_mapi.SQLAlchemyModelAPI):
+        model_storage['api'] = proxy_mapi.ProxyModelAPI
+        model_storage['api_kwargs'] = dict(model_storage['api_kwargs'] or {},
+                                           commit_proxy=messenger.commit)
+
+
 if __name__ == '__main__':
     _main()
@@ -28,6 +28,7 @@ from . import (
     core,
     filesystem_rapi,
     sql_mapi,
+    proxy_mapi,
 )
 
 __all__ = (
@@ -37,5 +38,6 @@ __all__ = (
     'ResourceStorage',
     'filesystem_rapi',
     'sql_mapi',
+    'proxy_mapi',
     'api',
 )
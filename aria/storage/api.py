@@ -54,6 +54,17 @@ class ModelAPI(StorageAPI):
             self._thread_local._instrumentation = []
         return self._thread_local._instrumentation
 
+    @property
+    def _batch_depth(self):
+        """
+        Number of nested :meth:`~aria.storage.core.ModelStorage.batch` blocks the current thread is
+        in.
+        """
+        return getattr(self._thread_local, '_batch_depth', 0)
+
+    @_batch_depth.setter
+    def _batch_depth(self, value):
+        self._thread_local._batch_depth = value
 
     @property
     def name(self):
@@ -89,6 +100,14 @@ class ModelAPI(StorageAPI):
         """
         raise NotImplementedError('Subclass must implement abstract store method')
 
+    def put_many(self, entries, **kwargs):
+        """
+        Puts several models in storage at once.
+
+        :param entries:
+        """
+        raise NotImplementedError('Subclass must implement abstract put_many method')
+
     def delete(self, entry_id, **kwargs):
         """
         Deletes a model from storage.
@@ -115,6 +134,27 @@ class ModelAPI(StorageAPI):
         """
         raise NotImplementedError('Subclass must implement abstract update method')
 
+    def update_many(self, entries, **kwargs):
+        """
+        Update several models in storage at once.
+
+        :param entries:
+        :param kwargs:
+        """
+        raise NotImplementedError('Subclass must implement abstract update_many method')
+
+    def _commit_batch(self):
+        """
+        Commits the changes made in the outermost batch block which just ended.
+        """
+        raise NotImplementedError('Subclass must implement abstract _commit_batch method')
+
+    def _discard_batch(self):
+        """
+        Discards the changes made in the outermost batch block which just failed.
+        """
+        raise NotImplementedError('Subclass must implement abstract _discard_batch method')
+
 
 class ResourceAPI(StorageAPI):
     """
@@ -146,6 +146,38 @@ class ModelStorage(Storage):
         for mapi in self.registered.itervalues():
             mapi.drop()
 
+    @contextmanager
+    def batch(self):
+        """
+        Defers the commits of the MAPIs to the end of the block, so that everything written in the
+        block is stored in a single transaction. If the block raises an exception, everything
+        written in it is discarded.
+
+        Blocks may be nested, in which case the commit (or discard) happens at the end of the
+        outermost block. Only writes made by the current thread are deferred.
+        """
+        mapis = self.registered.values()
+        for mapi in mapis:
+            mapi._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self._end_batch(mapis):
+                mapis[0]._discard_batch()
+            raise
+        if self._end_batch(mapis):
+            mapis[0]._commit_batch()
+
+    @staticmethod
+    def _end_batch(mapis):
+        """
+        Leaves a batch block, and tells whether it was the outermost one.
+        """
+        for mapi in mapis:
+            mapi._batch_depth -= 1
+        # All the MAPIs share the same session, so any of them may end the batch
+        return bool(mapis) and mapis[0]._batch_depth == 0
+
     @contextmanager
     def instrument(self, *instrumentation):
         original_instrumentation = {}
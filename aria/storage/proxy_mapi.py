@@ -0,0 +1,269 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+SQLAlchemy storage model API ("MAPI") which reads from the database, but has another process write
+to it.
+
+Instead of flushing the changes of its session, the MAPI collects them into a picklable list and
+passes it to a commit proxy. The other process applies the changes to its own session with
+:func:`apply_changes`, and returns the primary keys of the new instances. The MAPI then discards
+the changes of its session, which reloads the instances from the database once they are used again.
+
+Changes to versioned instances carry the version they were made to, so that concurrent
+modifications are detected as they are without a proxy.
+"""
+
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.collections import collection_adapter
+from sqlalchemy.orm.exc import StaleDataError
+
+from . import (
+    exceptions,
+    sql_mapi
+)
+
+_NEW = 'new'
+_DIRTY = 'dirty'
+_DELETED = 'deleted'
+
+
+class ProxyModelAPI(sql_mapi.SQLAlchemyModelAPI):
+    """
+    SQLAlchemy MAPI which commits through a proxy.
+    """
+
+    def __init__(self, commit_proxy, session, **kwargs):
+        """
+        :param commit_proxy: function which applies a list of changes, and returns the primary keys
+         of the new instances
+        """
+        # Changes are only written through the proxy
+        session.configure(autoflush=False)
+        super(ProxyModelAPI, self).__init__(session=session, **kwargs)
+        self._commit_proxy = commit_proxy
+
+    def _safe_commit(self):
+        if self._batch_depth:
+            # Collected and sent at the end of the batch; the IDs of new instances are only
+            # populated then
+            return
+        new_instances = list(self._session.new)
+        changes = collect_changes(self._session, new_instances)
+        try:
+            identities = self._commit_proxy(changes) if changes else []
+        finally:
+            self._session.rollback()
+        _attach(self._session, new_instances, identities)
+
+
+def collect_changes(session, new_instances=None):
+    """
+    Collects the changes of the session which haven't been flushed.
+
+    :param session: SQLAlchemy session
+    :param new_instances: new instances of the session, in the order their primary keys are
+     returned by :func:`apply_changes`
+    :return: list of changes, which can be pickled
+    """
+    new_instances = list(session.new) if new_instances is None else new_instances
+    new_refs = dict((id(instance), (_NEW, index)) for index, instance in enumerate(new_instances))
+
+    def ref(instance):
+        if instance is None:
+            return None
+        if id(instance) in new_refs:
+            return new_refs[id(instance)]
+        identity = inspect(instance).identity
+        if identity is None:
+            raise exceptions.StorageError(
+                u'{0} is referenced, but is not in the session'.format(instance))
+        return type(instance), identity
+
+    changes = []
+    for instance in new_instances:
+        changes.append((_NEW, type(instance), None, None) +
+                       _collect_attributes(instance, ref, True))
+    for instance in session.dirty:
+        if session.is_modified(instance):
+            state = inspect(instance)
+            changes.append((_DIRTY, type(instance), state.identity, _loaded_version(state)) +
+                           _collect_attributes(instance, ref, False))
+    for instance in session.deleted:
+        state = inspect(instance)
+        changes.append((_DELETED, type(instance), state.identity, _loaded_version(state), {}, {}))
+    return changes
+
+
+def apply_changes(session, changes):
+    """
+    Applies changes collected by :func:`collect_changes`, and commits them.
+
+    :param session: SQLAlchemy session
+    :param changes: list of changes
+    :return: primary keys of the new instances
+    """
+    try:
+        new_instances = [model_cls() for operation, model_cls, _, _, _, _ in changes
+                         if operation == _NEW]
+
+        def resolve(reference):
+            if reference is None:
+                return None
+            if reference[0] == _NEW:
+                return new_instances[reference[1]]
+            return _get(session, *reference)
+
+        # Instances are only complete once all the changes are applied
+        with session.no_autoflush:
+            new_instances_iter = iter(new_instances)
+            for operation, model_cls, identity, version, columns, relationships in changes:
+                if operation == _NEW:
+                    instance = next(new_instances_iter)
+                    session.add(instance)
+                else:
+                    instance = _get(session, model_cls, identity)
+                    # As with a session of its own, only changes which update or delete the row
+                    # are checked
+                    if operation == _DELETED or _updates_row(columns, relationships):
+                        _check_version(session, instance, version)
+                    if operation == _DELETED:
+                        session.delete(instance)
+                        continue
+                _set_attributes(instance, columns, relationships, resolve)
+
+        session.commit()
+    except StaleDataError as e:
+        session.rollback()
+        raise exceptions.StorageError('Version conflict: {0}'.format(str(e)))
+    except (SQLAlchemyError, ValueError) as e:
+        session.rollback()
+        raise exceptions.StorageError('SQL Storage error: {0}'.format(str(e)))
+    except BaseException:
+        session.rollback()
+        raise
+
+    return [inspect(instance).identity for instance in new_instances]
+
+
+def _updates_row(columns, relationships):
+    # Many-to-one relationships are written to the foreign key columns of the row
+    return bool(columns) or any(not isinstance(value, list)
+                                for value in relationships.itervalues())
+
+
+def _set_attributes(instance, columns, relationships, resolve):
+    for key, value in columns.iteritems():
+        setattr(instance, key, value)
+    for key, value in relationships.iteritems():
+        if not isinstance(value, list):
+            setattr(instance, key, resolve(value))
+    for key, value in relationships.iteritems():
+        if isinstance(value, list):
+            _update_collection(getattr(instance, key), value, resolve)
+
+
+def _update_collection(collection, changes, resolve):
+    adapter = collection_adapter(collection)
+    for added, reference in changes:
+        item = resolve(reference)
+        if added and item not in list(adapter):
+            adapter.append_with_event(item)
+        elif not added and item in list(adapter):
+            adapter.remove_with_event(item)
+
+
+def _collect_attributes(instance, ref, is_new):
+    state = inspect(instance)
+    columns = {}
+    for attribute in state.mapper.column_attrs:
+        if is_new:
+            if state.dict.get(attribute.key) is not None:
+                columns[attribute.key] = state.dict[attribute.key]
+        else:
+            history = state.attrs[attribute.key].history
+            if history.added or history.deleted:
+                columns[attribute.key] = history.added[0] if history.added else None
+
+    relationships = {}
+    for relationship in state.mapper.relationships:
+        history = state.attrs[relationship.key].history
+        if not history.has_changes():
+            continue
+        if relationship.uselist:
+            # Pairs of whether the item was added to the collection and a reference to it
+            relationships[relationship.key] = \
+                [(False, ref(item)) for item in history.deleted if item is not None] + \
+                [(True, ref(item)) for item in history.added if item is not None]
+        else:
+            relationships[relationship.key] = ref(state.dict.get(relationship.key))
+    return columns, relationships
+
+
+def _loaded_version(state):
+    """
+    Returns the version the instance was loaded with, or ``None`` if its model isn't versioned.
+    """
+    if state.mapper.version_id_col is None:
+        return None
+    # Loaded if it was expired, as the session would do when flushing
+    history = state.attrs[_version_key(state.mapper)].load_history()
+    return (history.deleted or history.unchanged or [None])[0]
+
+
+def _check_version(session, instance, version):
+    """
+    Checks that the row of the instance is still of the version the changes were made to.
+    """
+    if version is None:
+        return
+    key = _version_key(inspect(instance).mapper)
+    # The instance may have been loaded by the session before the row was last updated
+    session.refresh(instance, [key])
+    current_version = getattr(instance, key)
+    if current_version != version:
+        # Reported as the session reports the versions it checks when flushing
+        raise StaleDataError(
+            '`{0}` with ID `{1}` was changed at version {2}, but is at version {3}'
+            .format(type(instance).__name__, inspect(instance).identity, version,
+                    current_version))
+
+
+def _version_key(mapper):
+    return mapper.get_property_by_column(mapper.version_id_col).key
+
+
+def _get(session, model_cls, identity):
+    instance = session.query(model_cls).get(identity)
+    if instance is None:
+        raise exceptions.NotFoundError(
+            'Requested `{0}` with ID `{1}` was not found'.format(model_cls.__name__, identity))
+    return instance
+
+
+def _attach(session, instances, identities):
+    """
+    Attaches new instances, which were written by the proxy, to the session.
+    """
+    for instance, identity in zip(instances, identities):
+        mapper = inspect(instance).mapper
+        for column, value in zip(mapper.primary_key, identity):
+            setattr(instance, mapper.get_property_by_column(column).key, value)
+        make_transient_to_detached(instance)
+    # Added only once they are all detached, since adding an instance adds the instances it
+    # references as well
+    session.add_all(instances[:len(identities)])
@@ -22,7 +22,9 @@ import platform
 
 from sqlalchemy import (
     create_engine,
+    event,
     orm,
+    pool,
 )
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm.exc import StaleDataError
@@ -41,6 +43,18 @@ _predicates = {'ge': '__ge__',
                'eq': '__eq__',
                'ne': '__ne__'}
 
+# Strategies for loading relationships along with the models which are queried. Collections are
+# loaded in a separate query by default (SQLAlchemy's "selectin" loading is not available, and the
+# "subquery" one is the closest to it), and references are joined. "raise" prevents loading
+# relationships lazily, by raising an error when they are accessed.
+LOADING_STRATEGIES = OrderedDict((
+    ('joined', 'joinedload'),
+    ('subquery', 'subqueryload'),
+    ('selectin', 'subqueryload'),
+    ('select', 'lazyload'),
+    ('raise', 'raiseload'),
+))
+
 
 class SQLAlchemyModelAPI(api.ModelAPI):
     """
@@ -55,11 +69,11 @@ class SQLAlchemyModelAPI(api.ModelAPI):
         self._engine = engine
         self._session = session
 
-    def get(self, entry_id, include=None, **kwargs):
+    def get(self, entry_id, include=None, load=None, **kwargs):
         """
         Returns a single result based on the model class and element ID
         """
-        query = self._get_query(include, {'id': entry_id})
+        query = self._get_query(include, {'id': entry_id}, load=load)
         result = query.first()
 
         if not result:
@@ -69,9 +83,9 @@ class SQLAlchemyModelAPI(api.ModelAPI):
             )
         return self._instrument(result)
 
-    def get_by_name(self, entry_name, include=None, **kwargs):
+    def get_by_name(self, entry_name, include=None, load=None, **kwargs):
         assert hasattr(self.model_cls, 'name')
-        result = self.list(include=include, filters={'name': entry_name})
+        result = self.list(include=include, filters={'name': entry_name}, load=load)
         if not result:
             raise exceptions.NotFoundError(
                 'Requested {0} with name `{1}` was not found'
@@ -90,8 +104,9 @@ class SQLAlchemyModelAPI(api.ModelAPI):
              filters=None,
              pagination=None,
              sort=None,
+             load=None,
              **kwargs):
-        query = self._get_query(include, filters, sort)
+        query = self._get_query(include, filters, sort, load)
 
         results, total, size, offset = self._paginate(query, pagination)
 
@@ -104,12 +119,40 @@ class SQLAlchemyModelAPI(api.ModelAPI):
              include=None,
              filters=None,
              sort=None,
+             load=None,
+             batch_size=None,
              **kwargs):
         """
         Returns a (possibly empty) list of ``model_class`` results.
-        """
-        for result in self._get_query(include, filters, sort):
-            yield self._instrument(result)
+
+        With ``batch_size``, the results are streamed in batches of (at most) that many, by order of
+        their IDs. Every batch is a separate query, which resumes after the last ID of the previous
+        one, so fetching a batch takes the same time however deep into the table it is, and the
+        results are never held in memory all at once. Results can't be sorted otherwise, and when
+        only some columns are included, ``id`` must be one of them.
+        """
+        if batch_size is None:
+            for result in self._get_query(include, filters, sort, load):
+                yield self._instrument(result)
+            return
+
+        if sort and sort.items() != [('id', 'asc')]:
+            raise exceptions.StorageError('Results iterated in batches are sorted by ID')
+        if include and 'id' not in include:
+            raise exceptions.StorageError('Results iterated in batches must include their ID')
+        query = self._get_query(include, filters, load=load)
+        id_column = self.model_cls.id
+        last_id = None
+        while True:
+            batch_query = query if last_id is None else query.filter(id_column > last_id)
+            # Each batch is fetched whole (rather than with yield_per), since SQLite cursors don't
+            # survive the session being committed while the results are being consumed
+            results = batch_query.order_by(id_column).limit(batch_size).all()
+            for result in results:
+                yield self._instrument(result)
+            if len(results) < batch_size:
+                return
+            last_id = results[-1].id
 
     def put(self, entry, **kwargs):
         """
@@ -124,6 +167,18 @@ class SQLAlchemyModelAPI(api.ModelAPI):
         self._safe_commit()
         return entry
 
+    def put_many(self, entries, **kwargs):
+        """
+        Creates several ``model_class`` instances in a single transaction.
+
+        :param entries: instances of ``model_class``
+        :return: list of the instances
+        """
+        entries = list(entries)
+        self._session.add_all(entries)
+        self._safe_commit()
+        return entries
+
     def delete(self, entry, **kwargs):
         """
         Deletes a single result based on the model class and element ID.
@@ -141,15 +196,33 @@ class SQLAlchemyModelAPI(api.ModelAPI):
         """
         return self.put(entry)
 
-    def refresh(self, entry):
+    def update_many(self, entries, **kwargs):
+        """
+        Adds several instances to the database session, and attempts to commit them in a single
+        transaction.
+
+        :return: list of the updated instances
+        """
+        return self.put_many(entries)
+
+    def refresh(self, entry, attributes=None):
         """
         Reloads the instance with fresh information from the database.
 
         :param entry: instance to be re-loaded from the database
+        :param attributes: names of the attributes (columns or relationships) to reload; all of
+         them are reloaded if not specified
         :return: refreshed instance
         """
-        self._session.refresh(entry)
-        self._load_relationships(entry)
+        if attributes is None:
+            self._session.refresh(entry)
+            self._load_relationships(entry)
+        else:
+            self._session.refresh(entry, attribute_names=attributes)
+            relationships = entry.__mapper__.relationships
+            for attribute in attributes:
+                if attribute in relationships:
+                    getattr(entry, attribute)
         return entry
 
     def _destroy_connection(self):
@@ -172,13 +245,25 @@ class SQLAlchemyModelAPI(api.ModelAPI):
         """
         self.model_cls.__table__.drop(self._engine)
 
+    def _commit_batch(self):
+        self._safe_commit()
+
+    def _discard_batch(self):
+        self._session.rollback()
+
     def _safe_commit(self):
         """
         Try to commit changes in the session. Roll back if exception raised SQLAlchemy errors and
         rolls back if they're caught.
+
+        Within a :meth:`~aria.storage.core.ModelStorage.batch` block the changes are only flushed
+        (so that IDs are populated and queries see them), and are committed at its end.
         """
         try:
-            self._session.commit()
+            if self._batch_depth:
+                self._session.flush()
+            else:
+                self._session.commit()
         except StaleDataError as e:
             self._session.rollback()
             raise exceptions.StorageError('Version conflict: {0}'.format(str(e)))
@@ -273,7 +358,8 @@ class SQLAlchemyModelAPI(api.ModelAPI):
     def _get_query(self,
                    include=None,
                    filters=None,
-                   sort=None):
+                   sort=None,
+                   load=None):
         """
         Gets a SQL query object based on the params passed.
 
@@ -283,8 +369,15 @@ class SQLAlchemyModelAPI(api.ModelAPI):
          are values applicable for those columns (or lists of such values)
         :param sort: optional dictionary where keys are column names to sort by, and values are the
          order (asc/desc)
+        :param load: optional list of relationship paths (e.g. ``interfaces.operations``) to load
+         along with the results, or dictionary where keys are such paths and values are loading
+         strategies (see :data:`LOADING_STRATEGIES`); the path ``*`` stands for all the other
+         relationships
         :return: sorted and filtered query with only the relevant columns
         """
+        if load and include:
+            raise exceptions.StorageError('Relationships can only be loaded along with models, '
+                                          'not with included columns')
         include, filters, sort, joins = self._get_joins_and_converted_columns(
             include, filters, sort
         )
@@ -293,8 +386,48 @@ class SQLAlchemyModelAPI(api.ModelAPI):
         query = self._get_base_query(include, joins)
         query = self._filter_query(query, filters)
         query = self._sort_query(query, sort)
+        if load:
+            query = query.options(*self._get_loading_options(load))
         return query
 
+    def _get_loading_options(self, load):
+        """
+        Converts relationship paths into SQLAlchemy loader options.
+
+        Relationships on the way to the last one of a path are loaded with their default strategy,
+        so ``interfaces.operations`` loads the interfaces as well.
+        """
+        if not isinstance(load, dict):
+            load = OrderedDict((path, None) for path in load)
+        options = []
+        for path, strategy in load.items():
+            if strategy is not None and strategy not in LOADING_STRATEGIES:
+                raise exceptions.StorageError(
+                    '{0} is not a valid loading strategy. Valid strategies are {1}'
+                    .format(strategy, ', '.join(LOADING_STRATEGIES.keys())))
+            if path == '*':
+                options.append(getattr(orm.Load(self.model_cls),
+                                       LOADING_STRATEGIES[strategy or 'raise'])('*'))
+                continue
+            option = orm.Load(self.model_cls)
+            mapper = self.model_cls.__mapper__
+            keys = path.split('.')
+            for index, key in enumerate(keys):
+                relationship = mapper.relationships.get(key)
+                if relationship is None:
+                    raise exceptions.StorageError(
+                        '{0} has no relationship {1} (in {2})'.format(
+                            mapper.class_.__name__, key, path))
+                if strategy is None or index < len(keys) - 1:
+                    key_strategy = 'subquery' if relationship.uselist else 'joined'
+                else:
+                    key_strategy = strategy
+                option = getattr(option, LOADING_STRATEGIES[key_strategy])(
+                    getattr(mapper.class_, key))
+                mapper = relationship.mapper
+            options.append(option)
+        return options
+
     @staticmethod
     def _convert_operands(filters):
         for column, conditions in filters.items():
@@ -401,7 +534,23 @@ class SQLAlchemyModelAPI(api.ModelAPI):
             return model
 
 
-def init_storage(base_dir, filename='db.sqlite'):
+# Tuned SQLite settings, used by the CLI. The write-ahead log lets readers (such as the CLI
+# following an execution's logs, or operations in subprocesses) proceed while the engine writes,
+# and synchronous=NORMAL is durable enough with it, since only the last transactions may be lost on
+# a power failure. Connections are pooled, so that they (and their page caches) outlive sessions.
+SQLITE_PROFILE = dict(
+    journal_mode='WAL',
+    synchronous='NORMAL',
+    cache_size=-65536,                  # negative is in KiB
+    mmap_size=256 * 1024 * 1024,        # in bytes
+    busy_timeout=15,                    # in seconds
+    pool_size=5
+)
+
+_SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size')
+
+
+def init_storage(base_dir, filename='db.sqlite', profile=None):
     """
     Built-in ModelStorage initiator.
 
@@ -412,6 +561,8 @@ def init_storage(base_dir, filename='db.sqlite'):
 
     :param base_dir: directory of the database
     :param filename: database file name.
+    :param profile: SQLite settings (any of the keys of :data:`SQLITE_PROFILE`); settings which are
+     not specified are left at SQLite's (and SQLAlchemy's) defaults
     :return:
     """
     uri = 'sqlite:///{platform_char}{path}'.format(
@@ -421,7 +572,33 @@ def init_storage(base_dir, filename='db.sqlite'):
 
         path=os.path.join(base_dir, filename))
 
-    engine = create_engine(uri, connect_args=dict(timeout=15))
+    profile = profile or {}
+    unknown_settings = set(profile) - set(SQLITE_PROFILE)
+    if unknown_settings:
+        raise exceptions.StorageError('Unknown SQLite profile settings: {0}'.format(
+            ', '.join(sorted(unknown_settings))))
+
+    connect_args = dict(timeout=profile.get('busy_timeout', 15))
+    engine_kwargs = {}
+    if profile.get('pool_size') is not None:
+        # Each connection is used by a single thread at a time, yet not always by the same one.
+        # Overflowing connections are not limited, since every thread has its own session.
+        connect_args['check_same_thread'] = False
+        engine_kwargs.update(poolclass=pool.QueuePool,
+                             pool_size=profile['pool_size'],
+                             max_overflow=-1)
+    engine = create_engine(uri, connect_args=connect_args, **engine_kwargs)
+
+    pragmas = _sqlite_pragmas(profile)
+    if pragmas:
+        @event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record):                                      # pylint: disable=unused-argument,unused-variable
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
 
     session_factory = orm.sessionmaker(bind=engine)
     session = orm.scoped_session(session_factory=session_factory)
@@ -429,6 +606,24 @@ def init_storage(base_dir, filename='db.sqlite'):
     return dict(engine=engine, session=session)
 
 
+def _sqlite_pragmas(profile):
+    pragmas = []
+    for name in _SQLITE_PRAGMAS:
+        value = profile.get(name)
+        if value is None:
+            continue
+        # Pragma values can't be bound as parameters, so they are validated instead
+        if isinstance(value, basestring):
+            if not value.isalpha():
+                raise exceptions.StorageError(
+                    'Invalid value for SQLite setting {0}: {1}'.format(name, value))
+        elif not isinstance(value, (int, long)):
+            raise exceptions.StorageError(
+                'Invalid value for SQLite setting {0}: {1!r}'.format(name, value))
+        pragmas.append('PRAGMA {0} = {1}'.format(name, value))
+    return pragmas
+
+
 class ListResult(list):
     """
     Contains results about the requested items.
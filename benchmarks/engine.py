@@ -0,0 +1,286 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmarks compiling and executing synthetic workflows.
+
+Usage::
+
+    python -m benchmarks.engine --shapes wide deep diamond --sizes 1000 10000 \\
+        --executors stub dry thread process pool
+
+The benchmark builds its service with the mock fixtures of the ``tests`` package, and its operation
+is imported from the ``benchmarks`` package, so it runs only from a source checkout, with the root
+of the repository as the working directory (``make benchmark`` does so).
+
+Every scenario runs in a fresh subprocess against a fresh SQLite storage, so the reported peak RSS
+is that of the scenario alone. The reported figures are:
+
+* compile: time it took to compile the task graph into task models (seconds)
+* execute: time it took the engine to execute the workflow (seconds)
+* overhead/task: execution time per task (milliseconds); since the operations do nothing, this is
+  the scheduling overhead of the engine and the executor
+* queries/task: SQL statements issued per task, while compiling and while executing
+* peak RSS: peak resident memory of the scenario's process (megabytes)
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import Queue
+import shutil
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from aria.orchestrator import workflow, operation
+from aria.orchestrator.workflows import api
+from aria.orchestrator.workflows.core import engine, graph_compiler
+from aria.orchestrator.workflows.executor import base, coroutine, dry, process, thread
+
+from tests import mock
+
+
+SHAPES = ('wide', 'deep', 'diamond')
+EXECUTORS = ('stub', 'dry', 'thread', 'coroutine', 'process', 'pool')
+DEFAULT_EXECUTORS = ('stub', 'dry', 'thread')
+DEFAULT_SIZES = (1000, )
+# Maximum time (in seconds) a scenario may run for
+SCENARIO_TIMEOUT = 30 * 60
+
+INTERFACE_NAME = 'benchmark'
+OPERATION_NAME = 'noop'
+# Referenced by its full name, so it is importable also when this module is run as __main__
+OPERATION_FUNCTION = 'benchmarks.engine.noop'
+# Added to the Python path of subprocesses, so they can import the operation
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_COLUMNS = (
+    ('shape', '{0}'),
+    ('size', '{0}'),
+    ('executor', '{0}'),
+    ('compile', '{0:.2f}s'),
+    ('execute', '{0:.2f}s'),
+    ('overhead/task', '{0:.2f}ms'),
+    ('compile queries/task', '{0:.2f}'),
+    ('execute queries/task', '{0:.2f}'),
+    ('peak RSS', '{0:.1f}MB'),
+)
+
+
+@operation
+def noop(**_):
+    pass
+
+
+@workflow
+def synthetic_workflow(ctx, graph, shape, size, stub):
+    """
+    Builds a synthetic workflow of ``size`` tasks:
+
+    * ``wide``: independent tasks
+    * ``deep``: a single chain of tasks
+    * ``diamond``: a lattice of about ``sqrt(size)`` layers of ``sqrt(size)`` tasks, where every
+      task depends on two neighbouring tasks of the previous layer
+    """
+    if stub:
+        tasks = [api.task.StubTask() for _ in xrange(size)]
+    else:
+        node = ctx.model.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+        tasks = [api.task.OperationTask(node, INTERFACE_NAME, OPERATION_NAME)
+                 for _ in xrange(size)]
+
+    if shape == 'wide':
+        graph.add_tasks(*tasks)
+    elif shape == 'deep':
+        graph.sequence(*tasks)
+    elif shape == 'diamond':
+        graph.add_tasks(*tasks)
+        width = max(int(math.sqrt(size)), 1)
+        layers = [tasks[i:i + width] for i in xrange(0, size, width)]
+        for previous_layer, layer in zip(layers, layers[1:]):
+            for index, task in enumerate(layer):
+                graph.add_dependency(task, previous_layer[index % len(previous_layer)])
+                graph.add_dependency(task, previous_layer[(index + 1) % len(previous_layer)])
+    else:
+        raise ValueError('Unknown shape: {0}'.format(shape))
+
+
+def run_scenario(shape, size, executor_name):
+    """
+    Compiles and executes a single synthetic workflow, in the current process.
+
+    :return: dict of the measured figures
+    """
+    workdir = tempfile.mkdtemp(prefix='aria-benchmark-')
+    try:
+        ctx = mock.context.simple(workdir)
+        _add_noop_operation(ctx)
+        executor = _create_executor(executor_name)
+        queries = _count_queries(ctx)
+        try:
+            graph = synthetic_workflow(ctx=ctx, shape=shape, size=size,                             # pylint: disable=no-value-for-parameter
+                                       stub=executor_name == 'stub')
+
+            queries[0] = 0
+            start = time.time()
+            graph_compiler.GraphCompiler(ctx, executor.__class__).compile(graph)
+            compile_time = time.time() - start
+            compile_queries = queries[0]
+
+            queries[0] = 0
+            start = time.time()
+            engine.Engine(executor).execute(ctx)
+            execute_time = time.time() - start
+            execute_queries = queries[0]
+        finally:
+            executor.close()
+
+        return {
+            'shape': shape,
+            'size': size,
+            'executor': executor_name,
+            'compile': compile_time,
+            'execute': execute_time,
+            'overhead/task': execute_time * 1000 / size,
+            'compile queries/task': float(compile_queries) / size,
+            'execute queries/task': float(execute_queries) / size,
+            'peak RSS': _peak_rss() / (1024.0 * 1024),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _add_noop_operation(ctx):
+    node = ctx.model.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+    interface = mock.models.create_interface(
+        node.service, INTERFACE_NAME, OPERATION_NAME,
+        operation_kwargs={'function': OPERATION_FUNCTION})
+    node.interfaces[interface.name] = interface
+    ctx.model.node.update(node)
+
+
+def _create_executor(executor_name):
+    if executor_name == 'stub':
+        return base.StubTaskExecutor()
+    elif executor_name == 'dry':
+        return dry.DryExecutor()
+    elif executor_name == 'thread':
+        return thread.ThreadExecutor()
+    elif executor_name == 'coroutine':
+        return coroutine.CoroutineExecutor()
+    elif executor_name == 'process':
+        return process.ProcessExecutor(python_path=[ROOT_DIR])
+    elif executor_name == 'pool':
+        return process.ProcessExecutor(python_path=[ROOT_DIR], pool_size=multiprocessing.cpu_count())
+    raise ValueError('Unknown executor: {0}'.format(executor_name))
+
+
+def _count_queries(ctx):
+    queries = [0]
+
+    def count(*args, **kwargs):
+        queries[0] += 1
+    event.listen(ctx.model.task._engine, 'before_cursor_execute', count)
+    return queries
+
+
+def _peak_rss():
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows, settle for the current RSS
+        import psutil
+        return psutil.Process().memory_info().rss
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, and in kilobytes elsewhere
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def _scenario_subprocess_main(results, shape, size, executor_name):
+    # At module level, since the target of a subprocess is pickled where processes are spawned
+    # rather than forked (e.g. on Windows)
+    try:
+        results.put(run_scenario(shape, size, executor_name))
+    except BaseException as e:
+        results.put({'error': '{0}: {1}'.format(type(e).__name__, e)})
+
+
+def _run_scenario_in_subprocess(shape, size, executor_name):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_scenario_subprocess_main,
+                                      args=(results, shape, size, executor_name))
+    process.start()
+    deadline = time.time() + SCENARIO_TIMEOUT
+    result = None
+    try:
+        # Polled, so that a subprocess which died without a result isn't waited for until the
+        # deadline
+        while result is None and time.time() < deadline:
+            try:
+                result = results.get(timeout=1)
+            except Queue.Empty:
+                if not process.is_alive() and results.empty():
+                    break
+    finally:
+        if result is None and process.is_alive():
+            process.terminate()
+        process.join()
+    if result is None and time.time() >= deadline:
+        raise RuntimeError('{0}/{1}/{2} failed: timed out after {3}s'.format(
+            shape, size, executor_name, SCENARIO_TIMEOUT))
+    if result is None or process.exitcode != 0:
+        raise RuntimeError('{0}/{1}/{2} failed: exited with code {3}'.format(
+            shape, size, executor_name, process.exitcode))
+    if 'error' in result:
+        raise RuntimeError('{0}/{1}/{2} failed: {3}'.format(
+            shape, size, executor_name, result['error']))
+    return result
+
+
+def _format_table(results):
+    rows = [[name for name, _ in _COLUMNS]]
+    rows.extend([fmt.format(result[name]) for name, fmt in _COLUMNS] for result in results)
+    widths = [max(len(row[i]) for row in rows) for i in xrange(len(_COLUMNS))]
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(row, widths))
+                     for row in rows)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmarks the workflow engine.')
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument('--executors', nargs='+', choices=EXECUTORS,
+                        default=list(DEFAULT_EXECUTORS))
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(args)
+
+    results = []
+    for size in args.sizes:
+        for shape in args.shapes:
+            for executor_name in args.executors:
+                results.append(_run_scenario_in_subprocess(shape, size, executor_name))
+                if not args.json:
+                    sys.stderr.write('done: {0}/{1}/{2}\n'.format(shape, size, executor_name))
+
+    print json.dumps(results, indent=2) if args.json else _format_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -53,8 +53,14 @@ win_ssh_requires = [
     'pypiwin32>=220'
 ]
 
+networkx_requires = [
+    # Optional task graph backend (see aria.orchestrator.workflows.api.task_graph)
+    'networkx>=2.0, <2.1'
+]
+
 extras_require = {
     'ssh': ssh_requires,
+    'networkx': networkx_requires,
     'ssh:sys_platform=="win32"': win_ssh_requires
 }
 
@@ -84,7 +84,9 @@ def test_builtin_workflow_instantiation(request):
     # validates the workflow runner instantiates properly when provided with a builtin workflow
     # (expecting no errors to be raised on undeclared workflow or missing workflow implementation)
     workflow_ctx = _get_preparer(request, 'install').prepare()
-    assert len(workflow_ctx.execution.tasks) == 18  # expecting 18 tasks for 2 node topology
+    # expecting 12 operation tasks for 2 node topology, along with the start and end markers of
+    # the workflow (the markers of the sub-workflows are elided)
+    assert len(workflow_ctx.execution.tasks) == 14
 
 
 def test_custom_workflow_instantiation(request):
@@ -200,6 +202,51 @@ def test_workflow_function_parameters(request, tmpdir):
     assert wf_call_kwargs.get('input3') == 7
 
 
+def test_builtin_workflow_plan_is_reused(request, model, mocker):
+    execution_preparer.plan_cache.clear()
+    first_ctx = _get_preparer(request, 'install').prepare()
+    _cancel(model, first_ctx.execution)
+
+    compile_ = mocker.spy(graph_compiler.GraphCompiler, 'compile')
+    second_ctx = _get_preparer(request, 'install').prepare()
+    assert compile_.call_count == 0
+    assert _tasks_structure(second_ctx.execution) == _tasks_structure(first_ctx.execution)
+    assert set(task.id for task in second_ctx.execution.tasks).isdisjoint(
+        task.id for task in first_ctx.execution.tasks)
+
+
+def test_builtin_workflow_plan_is_invalidated(request, model, mocker):
+    execution_preparer.plan_cache.clear()
+    first_ctx = _get_preparer(request, 'install').prepare()
+    _cancel(model, first_ctx.execution)
+
+    node = model.node.get_by_name(tests_mock.models.DEPENDENCY_NODE_NAME)
+    operation = node.interfaces['Standard'].operations['create']
+    operation.function = '{0}.changed'.format(operation.function)
+    model.node.update(node)
+
+    compile_ = mocker.spy(graph_compiler.GraphCompiler, 'compile')
+    second_ctx = _get_preparer(request, 'install').prepare()
+    assert compile_.call_count == 1
+    assert len(second_ctx.execution.tasks) == len(first_ctx.execution.tasks)
+    assert operation.function in [task.function for task in second_ctx.execution.tasks]
+
+
+def test_builtin_workflow_plan_is_invalidated_by_relationships(request, model, mocker):
+    execution_preparer.plan_cache.clear()
+    first_ctx = _get_preparer(request, 'install').prepare()
+    _cancel(model, first_ctx.execution)
+
+    node = model.node.get_by_name(tests_mock.models.DEPENDENT_NODE_NAME)
+    relationship = node.outbound_relationships[0]
+    relationship.name = 'changed'
+    model.relationship.update(relationship)
+
+    compile_ = mocker.spy(graph_compiler.GraphCompiler, 'compile')
+    _get_preparer(request, 'install').prepare()
+    assert compile_.call_count == 1
+
+
 @pytest.fixture
 def service(model):
     # sets up a service in the storage
@@ -231,6 +278,20 @@ def _setup_mock_workflow_in_service(request, inputs=None):
     return mock_workflow_name
 
 
+def _cancel(model, execution):
+    execution.status = execution.CANCELLED
+    model.execution.update(execution)
+
+
+def _tasks_structure(execution):
+    tasks = sorted(execution.tasks, key=lambda task: task.id)
+    indexes = dict((task.id, index) for index, task in enumerate(tasks))
+    return [(task.name, task._stub_type, task.function, task.actor and task.actor.id,
+             dict((name, argument.value) for name, argument in task.arguments.iteritems()),
+             sorted(indexes[dependency.id] for dependency in task.dependencies))
+            for task in tasks]
+
+
 def _get_preparer(request, workflow_name):
     # helper method for instantiating a workflow runner
     service = request.getfixturevalue('service')
@@ -506,9 +506,9 @@ if __name__ == '__main__':
         return workflow_context.model.node.get_by_name(
             mock.models.DEPENDENCY_NODE_NAME).attributes
 
-    @pytest.fixture
-    def executor(self):
-        result = process.ProcessExecutor()
+    @pytest.fixture(params=[{}, {'proxy_commits': True}])
+    def executor(self, request):
+        result = process.ProcessExecutor(**request.param)
         try:
             yield result
         finally:
@@ -0,0 +1,159 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from aria.modeling import models
+from aria.orchestrator import engine_service, workflow, operation
+from aria.orchestrator.workflows import api
+from aria.orchestrator.workflows.executor import thread
+
+from tests import mock as tests_mock
+
+from ..fixtures import (                                                                            # pylint: disable=unused-import
+    plugins_dir,
+    plugin_manager,
+    fs_model as model,
+    resource_storage as resource
+)
+
+
+SERVICE_NAMES = ('service_0', 'service_1')
+WORKFLOW_NAME = 'test_workflow'
+
+_state = {}
+_state_lock = threading.Lock()
+_release = threading.Event()
+
+
+def test_executions_share_concurrency_limit(engine_svc, model):
+    # The tasks are held until both executions are running, so the first one takes all the slots
+    _release.clear()
+    execution_ids = [engine_svc.start(name, WORKFLOW_NAME) for name in SERVICE_NAMES]
+    _wait_for(lambda: all(model.execution.get(execution_id).status == models.Execution.STARTED
+                          for execution_id in execution_ids))
+    _release.set()
+    for execution_id in execution_ids:
+        assert engine_svc.wait(execution_id, timeout=60)
+
+    for execution_id in execution_ids:
+        assert model.execution.get(execution_id).status == models.Execution.SUCCEEDED
+    assert _state['max_running'] == 2
+    # Once both executions compete for the slots, each of them gets its share
+    assert _state['max_running_executions'] == 2
+    assert not engine_svc.running_executions
+
+
+def test_requests_over_socket(engine_svc, model):
+    engine_svc.listen()
+    client = engine_service.EngineServiceClient(engine_svc.address)
+
+    execution_id = client.start(SERVICE_NAMES[0], WORKFLOW_NAME)
+    assert execution_id in client.list()
+    assert engine_svc.wait(execution_id, timeout=60)
+    assert model.execution.get(execution_id).status == models.Execution.SUCCEEDED
+    assert client.list() == []
+
+    with pytest.raises(engine_service.EngineServiceError):
+        client.start('nonexistent_service', WORKFLOW_NAME)
+
+
+def test_cancel_over_socket(engine_svc, model):
+    _release.clear()
+    engine_svc.listen()
+    client = engine_service.EngineServiceClient(engine_svc.address)
+
+    execution_id = client.start(SERVICE_NAMES[0], WORKFLOW_NAME)
+    client.cancel(execution_id)
+    # The tasks are held until the cancel request is stored, so the execution can't end before
+    _wait_for(lambda: model.execution.get(execution_id).status in (models.Execution.CANCELLING,
+                                                                     models.Execution.CANCELLED))
+    _release.set()
+    assert engine_svc.wait(execution_id, timeout=60)
+    assert model.execution.get(execution_id).status == models.Execution.CANCELLED
+
+
+def test_socket_is_private(engine_svc):
+    engine_svc.listen()
+    if isinstance(engine_svc.address, tuple):
+        pytest.skip('Unix sockets are unavailable')
+    assert stat.S_IMODE(os.stat(os.path.dirname(engine_svc.address)).st_mode) == 0o700
+
+
+@pytest.fixture
+def engine_svc(model, resource, plugin_manager):
+    _state.clear()
+    _release.set()
+    for name in SERVICE_NAMES:
+        _create_service(model, name)
+    executor = thread.ThreadExecutor(pool_size=5)
+    result = engine_service.EngineService(model, resource, plugin_manager, executors=[executor],
+                                          max_concurrency=2)
+    try:
+        yield result
+    finally:
+        _release.set()
+        result.close()
+        executor.close()
+
+
+def _wait_for(predicate, timeout=60):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.1)
+
+
+def _create_service(model, name):
+    service_template = tests_mock.models.create_service_template(name='{0}_template'.format(name))
+    service = tests_mock.models.create_service(service_template, name=name)
+    node_template = tests_mock.models.create_dependency_node_template(service_template)
+    node = tests_mock.models.create_node(node_template, service, name='{0}_node'.format(name))
+    interface = tests_mock.models.create_interface(
+        service, 'test_interface', 'test_operation',
+        operation_kwargs={'function': '{0}.{1}'.format(__name__, mock_operation.__name__)})
+    node.interfaces[interface.name] = interface                                                     # pylint: disable=unsubscriptable-object
+    service.workflows[WORKFLOW_NAME] = tests_mock.models.create_operation(                          # pylint: disable=unsubscriptable-object
+        WORKFLOW_NAME,
+        operation_kwargs={'function': '{0}.{1}'.format(__name__, mock_workflow.__name__)})
+    model.service_template.put(service_template)
+    model.service.put(service)
+
+
+@workflow
+def mock_workflow(ctx, graph, number_of_tasks=4):
+    node = ctx.model.node.get_by_name('{0}_node'.format(ctx.service.name))
+    graph.add_tasks(*(api.task.OperationTask(node, 'test_interface', 'test_operation')
+                      for _ in xrange(number_of_tasks)))
+
+
+@operation
+def mock_operation(ctx, **_):
+    execution_id = ctx.task.execution.id
+    with _state_lock:
+        running = _state.setdefault('running', {})
+        running[execution_id] = running.get(execution_id, 0) + 1
+        _state['max_running'] = max(_state.get('max_running', 0), sum(running.values()))
+        _state['max_running_executions'] = max(_state.get('max_running_executions', 0),
+                                               len([count for count in running.values() if count]))
+    _release.wait(60)
+    time.sleep(0.2)
+    with _state_lock:
+        _state['running'][execution_id] -= 1
@@ -23,9 +23,9 @@ class MockTask(task.BaseTask):
         super(MockTask, self).__init__(ctx={})
 
 
-@pytest.fixture
-def graph():
-    return task_graph.TaskGraph(name='mock-graph')
+@pytest.fixture(params=sorted(task_graph.BACKENDS))
+def graph(request):
+    return task_graph.TaskGraph(name='mock-graph', backend=request.param)
 
 
 class TestTaskGraphTasks(object):
@@ -253,6 +253,52 @@ class TestTaskGraphGraphTraversal(object):
             list(graph.get_dependencies(task_not_in_graph))
 
 
+class TestTaskGraphTopologicalOrder(object):
+
+    def test_topological_order(self, graph):
+        tasks = [MockTask() for _ in xrange(6)]
+        graph.add_tasks(*tasks)
+        graph.add_dependency(tasks[1], tasks[0])
+        graph.add_dependency(tasks[2], tasks[0])
+        graph.add_dependency(tasks[3], [tasks[1], tasks[2]])
+        graph.add_dependency(tasks[5], tasks[4])
+
+        order = list(graph.topological_order(reverse=True))
+        assert set(order) == set(tasks)
+        for dependent in tasks:
+            for dependency in graph.get_dependencies(dependent):
+                assert order.index(dependency) < order.index(dependent)
+        assert list(graph.topological_order()) == list(reversed(order))
+
+    def test_topological_order_after_modification(self, graph):
+        tasks = [MockTask() for _ in xrange(3)]
+        graph.sequence(*tasks)
+        assert list(graph.topological_order(reverse=True)) == tasks
+
+        graph.remove_dependency(tasks[1], tasks[0])
+        graph.add_dependency(tasks[0], tasks[2])
+        assert list(graph.topological_order(reverse=True)) == [tasks[1], tasks[2], tasks[0]]
+
+        graph.remove_tasks(tasks[2])
+        new_task = MockTask()
+        graph.add_tasks(new_task)
+        graph.add_dependency(tasks[1], new_task)
+        order = list(graph.topological_order(reverse=True))
+        assert set(order) == set([tasks[0], tasks[1], new_task])
+        assert order.index(new_task) < order.index(tasks[1])
+
+    def test_topological_order_of_cycle(self, graph):
+        tasks = [MockTask() for _ in xrange(3)]
+        graph.sequence(*tasks)
+        graph.add_dependency(tasks[0], tasks[2])
+        with pytest.raises(task_graph.TaskGraphCycleError):
+            list(graph.topological_order())
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            task_graph.TaskGraph(name='mock-graph', backend='nonexistent')
+
+
 class TestTaskGraphDependencies(object):
 
     def test_add_dependency(self, graph):
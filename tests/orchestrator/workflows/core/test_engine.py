@@ -48,11 +48,11 @@ class BaseTest(object):
         return eng
 
     @staticmethod
-    def _engine(workflow_func, workflow_context, executor):
+    def _engine(workflow_func, workflow_context, executor, **engine_kwargs):
         graph = workflow_func(ctx=workflow_context)
         graph_compiler.GraphCompiler(workflow_context, executor.__class__).compile(graph)
 
-        return engine.Engine(executor)
+        return engine.Engine(executor, **engine_kwargs)
 
     @staticmethod
     def _create_interface(ctx, func, arguments=None):
@@ -215,6 +215,29 @@ class TestEngine(BaseTest):
         assert global_test_holder.get('invocations') == [1, 2]
         assert global_test_holder.get('sent_task_signal_calls') == 2
 
+    def test_diamond_execution_order(self, workflow_context, executor):
+        node, _, operation_name = self._create_interface(
+            workflow_context, mock_ordered_task, {'counter': 1})
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            op1 = self._op(node, operation_name, arguments={'counter': 1})
+            op2 = self._op(node, operation_name, arguments={'counter': 2})
+            op3 = self._op(node, operation_name, arguments={'counter': 2})
+            op4 = self._op(node, operation_name, arguments={'counter': 3})
+            graph.sequence(op1, op2, op4)
+            graph.add_tasks(op3)
+            graph.add_dependency(op3, op1)
+            graph.add_dependency(op4, op3)
+        self._execute(
+            workflow_func=mock_workflow,
+            workflow_context=workflow_context,
+            executor=executor)
+        assert workflow_context.states == ['start', 'success']
+        assert workflow_context.exception is None
+        assert global_test_holder.get('invocations') == [1, 2, 2, 3]
+        assert global_test_holder.get('sent_task_signal_calls') == 4
+
     def test_stub_and_subworkflow_execution(self, workflow_context, executor):
         node, _, operation_name = self._create_interface(
             workflow_context, mock_ordered_task, {'counter': 1})
@@ -237,6 +260,206 @@ class TestEngine(BaseTest):
         assert global_test_holder.get('invocations') == [1, 2]
         assert global_test_holder.get('sent_task_signal_calls') == 2
 
+    def test_engine_is_woken_up_by_ended_tasks(self, workflow_context, executor):
+        node, _, operation_name = self._create_interface(
+            workflow_context, mock_ordered_task, {'counter': 1})
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            graph.sequence(*(self._op(node, operation_name, arguments={'counter': counter})
+                             for counter in range(5)))
+        eng = self._engine(workflow_func=mock_workflow,
+                           workflow_context=workflow_context,
+                           executor=executor,
+                           max_wait_interval=60)
+
+        execution_start = time.time()
+        eng.execute(ctx=workflow_context)
+        # Had the engine waited for the maximum interval between the tasks, this would have taken
+        # minutes
+        assert time.time() - execution_start < 30
+        assert workflow_context.states == ['start', 'success']
+        assert global_test_holder.get('invocations') == range(5)
+
+    def test_only_ended_tasks_are_reloaded(self, workflow_context, executor, mocker):
+        number_of_tasks = 10
+        node, _, operation_name = self._create_interface(
+            workflow_context, mock_ordered_task, {'counter': 1})
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            graph.add_tasks(*(self._op(node, operation_name, arguments={'counter': counter})
+                              for counter in range(number_of_tasks)))
+        refresh = mocker.spy(workflow_context.model.task, 'refresh')
+        self._execute(
+            workflow_func=mock_workflow,
+            workflow_context=workflow_context,
+            executor=executor)
+        assert workflow_context.states == ['start', 'success']
+        assert sorted(global_test_holder.get('invocations')) == range(number_of_tasks)
+        # Each task (including the start and end stubs) is reloaded once it has ended
+        assert refresh.call_count == number_of_tasks + 2
+
+    def test_execution_is_not_reloaded(self, workflow_context, executor, mocker):
+        node, _, operation_name = self._create_interface(workflow_context, mock_success_task)
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            graph.sequence(*(self._op(node, operation_name) for _ in range(3)))
+        refresh = mocker.spy(workflow_context.model.execution, 'refresh')
+        self._execute(
+            workflow_func=mock_workflow,
+            workflow_context=workflow_context,
+            executor=executor)
+        assert workflow_context.states == ['start', 'success']
+        assert refresh.call_count == 0
+
+
+class TestConcurrencyLimits(BaseTest):
+
+    @pytest.fixture
+    def executor(self):
+        result = thread.ThreadExecutor(pool_size=5)
+        try:
+            yield result
+        finally:
+            result.close()
+
+    @pytest.mark.parametrize('engine_kwargs', [
+        dict(max_concurrency=2),
+        dict(per_executor_limits={thread.ThreadExecutor: 2}),
+        dict(max_concurrency=10, per_executor_limits={thread.ThreadExecutor: 2}),
+    ])
+    def test_concurrency_limit(self, workflow_context, executor, engine_kwargs):
+        number_of_tasks = 6
+        node, _, operation_name = self._create_interface(
+            workflow_context, mock_concurrent_task, {'seconds': 0.5})
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            graph.add_tasks(*(self._op(node, operation_name, arguments={'seconds': 0.5})
+                              for _ in range(number_of_tasks)))
+        eng = self._engine(workflow_func=mock_workflow,
+                           workflow_context=workflow_context,
+                           executor=executor,
+                           **engine_kwargs)
+        eng.execute(ctx=workflow_context)
+
+        assert workflow_context.states == ['start', 'success']
+        assert len(global_test_holder.get('invocations', [])) == number_of_tasks
+        assert global_test_holder.get('max_concurrent_invocations') == 2
+
+    def test_critical_path_is_prioritized(self, workflow_context, executor):
+        node, _, operation_name = self._create_interface(
+            workflow_context, mock_ordered_task, {'counter': 1})
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            # counter 1 marks the tasks of the long chain, 2 marks the independent tasks
+            graph.add_tasks(*(self._op(node, operation_name, arguments={'counter': 2})
+                              for _ in range(2)))
+            graph.sequence(*(self._op(node, operation_name, arguments={'counter': 1})
+                             for _ in range(3)))
+        eng = self._engine(workflow_func=mock_workflow,
+                           workflow_context=workflow_context,
+                           executor=executor,
+                           max_concurrency=1)
+        eng.execute(ctx=workflow_context)
+
+        assert workflow_context.states == ['start', 'success']
+        invocations = global_test_holder.get('invocations', [])
+        assert len(invocations) == 5
+        # The head of the longer chain is on the critical path, and so is its successor
+        assert invocations[:2] == [1, 1]
+
+    def test_back_pressure(self, workflow_context):
+        executor = thread.ThreadExecutor(pool_size=5,
+                                         admission_control=MockAdmissionControl(seconds=1))
+        try:
+            node, _, operation_name = self._create_interface(
+                workflow_context, mock_sleep_task, {'seconds': 0})
+
+            @workflow
+            def mock_workflow(ctx, graph):
+                graph.add_tasks(*(self._op(node, operation_name, arguments={'seconds': 0})
+                                  for _ in range(2)))
+            start = time.time()
+            self._execute(workflow_func=mock_workflow,
+                          workflow_context=workflow_context,
+                          executor=executor)
+        finally:
+            executor.close()
+
+        assert workflow_context.states == ['start', 'success']
+        invocations = global_test_holder.get('invocations', [])
+        assert len(invocations) == 2
+        assert all(invocation - start >= 1 for invocation in invocations)
+        messages = [log.msg for log in workflow_context.model.log.list()]
+        assert messages.count('Holding back tasks of ThreadExecutor: mock reason') == 1
+        assert messages.count('Resuming tasks of ThreadExecutor') == 1
+
+
+class TestWriteBehind(BaseTest):
+
+    @staticmethod
+    def _engine_with_write_behind(workflow_func, workflow_context, executor, interval):
+        graph = workflow_func(ctx=workflow_context)
+        graph_compiler.GraphCompiler(workflow_context, executor.__class__).compile(graph)
+        return engine.Engine(executor, write_behind_interval=interval)
+
+    def test_transitions_are_written_when_task_ends(self, workflow_context, executor):
+        node, _, operation_name = self._create_interface(
+            workflow_context, mock_status_recording_task, {'seconds': 0})
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            graph.add_tasks(self._op(node, operation_name, arguments={'seconds': 0}))
+        self._engine_with_write_behind(mock_workflow, workflow_context, executor, 60).execute(
+            ctx=workflow_context)
+
+        assert workflow_context.states == ['start', 'success']
+        # The task started, but that was not stored yet
+        assert global_test_holder['statuses'] == [(models.Task.STARTED, models.Task.PENDING)]
+        task = [t for t in workflow_context.execution.tasks if not t._stub_type][0]
+        assert task.status == models.Task.SUCCESS
+        assert task.started_at is not None
+
+    def test_transitions_are_written_on_interval(self, workflow_context, executor):
+        node, _, operation_name = self._create_interface(
+            workflow_context, mock_status_recording_task, {'seconds': 0.5})
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            graph.add_tasks(self._op(node, operation_name, arguments={'seconds': 0.5}))
+        self._engine_with_write_behind(mock_workflow, workflow_context, executor, 0.1).execute(
+            ctx=workflow_context)
+
+        assert workflow_context.states == ['start', 'success']
+        assert global_test_holder['statuses'] == [(models.Task.STARTED, models.Task.STARTED)]
+
+    def test_node_state(self, workflow_context, executor):
+        node = workflow_context.model.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+        interface = mock.models.create_interface(
+            node.service, 'Standard', 'create',
+            operation_kwargs=dict(
+                function='{0}.{1}'.format(__name__, mock_node_state_recording_task.__name__)))
+        node.interfaces[interface.name] = interface
+        workflow_context.model.node.update(node)
+        initial_state = node.state
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            graph.add_tasks(api.task.OperationTask(node, interface_name='Standard',
+                                                   operation_name='create'))
+        self._engine_with_write_behind(mock_workflow, workflow_context, executor, 60).execute(
+            ctx=workflow_context)
+
+        assert workflow_context.states == ['start', 'success']
+        assert global_test_holder['node_states'] == [(models.Node.CREATING, initial_state)]
+        node = workflow_context.model.node.get(node.id)
+        workflow_context.model.node.refresh(node)
+        assert node.state == models.Node.CREATED
+
 
 class TestCancel(BaseTest):
 
@@ -272,6 +495,36 @@ class TestCancel(BaseTest):
         assert execution.error is None
         assert execution.status == models.Execution.CANCELLED
 
+    def test_cancel_through_storage(self, workflow_context, executor):
+        # Cancel requests made by other processes are only reflected in the storage
+        number_of_tasks = 100
+        node, _, operation_name = self._create_interface(
+            workflow_context, mock_sleep_task, {'seconds': 0.1})
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            graph.sequence(*(self._op(node, operation_name, arguments=dict(seconds=0.1))
+                             for _ in range(number_of_tasks)))
+        eng = self._engine(workflow_func=mock_workflow,
+                           workflow_context=workflow_context,
+                           executor=executor,
+                           cancel_check_interval=0.5)
+        t = threading.Thread(target=eng.execute, kwargs=dict(ctx=workflow_context))
+        t.daemon = True
+        t.start()
+        while workflow_context.execution.status != models.Execution.STARTED:
+            assert t.is_alive()
+            time.sleep(0.1)
+        time.sleep(1)
+        execution = workflow_context.execution
+        execution.status = models.Execution.CANCELLING
+        workflow_context.model.execution.update(execution)
+        t.join(timeout=60)
+        assert not t.is_alive()
+        assert workflow_context.states == ['start', 'cancel']
+        assert 0 < len(global_test_holder.get('invocations', [])) < number_of_tasks
+        assert workflow_context.execution.status == models.Execution.CANCELLED
+
     def test_cancel_pending_execution(self, workflow_context, executor):
         @workflow
         def mock_workflow(graph, **_):
@@ -412,6 +665,34 @@ class TestRetries(BaseTest):
         assert invocation2 - invocation1 >= retry_interval
         assert global_test_holder.get('sent_task_signal_calls') == 2
 
+    def test_engine_is_woken_up_when_retry_is_due(self, workflow_context, executor):
+        retry_interval = 0.5
+        node, _, operation_name = self._create_interface(
+            workflow_context, mock_conditional_failure_task, {'failure_count': 1})
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            op = self._op(node, operation_name,
+                          arguments={'failure_count': 2},
+                          max_attempts=3,
+                          retry_interval=retry_interval)
+            graph.add_tasks(op)
+        eng = self._engine(workflow_func=mock_workflow,
+                           workflow_context=workflow_context,
+                           executor=executor,
+                           max_wait_interval=60)
+
+        execution_start = time.time()
+        eng.execute(ctx=workflow_context)
+        # Had the engine waited for the maximum interval before retrying, this would have taken
+        # minutes
+        assert time.time() - execution_start < 30
+        assert workflow_context.states == ['start', 'success']
+        invocations = global_test_holder.get('invocations', [])
+        assert len(invocations) == 3
+        assert all(later - earlier >= retry_interval
+                   for earlier, later in zip(invocations, invocations[1:]))
+
     def test_ignore_failure(self, workflow_context, executor):
         node, _, operation_name = self._create_interface(
             workflow_context, mock_conditional_failure_task, {'failure_count': 1})
@@ -512,6 +793,18 @@ class TestTaskRetryAndAbort(BaseTest):
         assert global_test_holder.get('sent_task_signal_calls') == 1
 
 
+class MockAdmissionControl(object):
+    """
+    Holds tasks back for a number of seconds since created.
+    """
+
+    def __init__(self, seconds):
+        self._until = time.time() + seconds
+
+    def check(self):
+        return 'mock reason' if time.time() < self._until else None
+
+
 @operation
 def mock_success_task(**_):
     pass
@@ -544,6 +837,35 @@ def mock_sleep_task(seconds, **_):
     time.sleep(seconds)
 
 
+_concurrent_invocations_lock = threading.Lock()
+
+
+@operation
+def mock_concurrent_task(seconds, **_):
+    with _concurrent_invocations_lock:
+        _add_invocation_timestamp()
+        running = global_test_holder.get('concurrent_invocations', 0) + 1
+        global_test_holder['concurrent_invocations'] = running
+        global_test_holder['max_concurrent_invocations'] = max(
+            running, global_test_holder.get('max_concurrent_invocations', 0))
+    time.sleep(seconds)
+    with _concurrent_invocations_lock:
+        global_test_holder['concurrent_invocations'] -= 1
+
+
+@operation
+def mock_status_recording_task(ctx, seconds, **_):
+    time.sleep(seconds)
+    stored_status = ctx.model.task.list(include=['status'], filters={'id': ctx.task.id})[0].status
+    global_test_holder.setdefault('statuses', []).append((ctx.task.status, stored_status))
+
+
+@operation
+def mock_node_state_recording_task(ctx, **_):
+    stored_state = ctx.model.node.list(include=['state'], filters={'id': ctx.node.id})[0].state
+    global_test_holder.setdefault('node_states', []).append((ctx.node.state, stored_state))
+
+
 @operation
 def mock_task_retry(ctx, message, retry_interval=None, **_):
     _add_invocation_timestamp()
@@ -25,6 +25,75 @@ from tests import storage
 
 
 def test_task_graph_into_execution_graph(tmpdir):
+    workflow_context, api_tasks = _create_nested_task_graph(tmpdir)
+    test_task_graph, simple_before_task, inner_task_graph, inner_task_1, inner_task_2, \
+        inner_task_3, simple_after_task = api_tasks
+
+    compiler = graph_compiler.GraphCompiler(workflow_context, base.StubTaskExecutor)
+    compiler.compile(test_task_graph)
+
+    execution_tasks = tuple(topological_sort(_graph(workflow_context.execution.tasks)))
+
+    assert len(execution_tasks) == 9
+
+    expected_tasks_names = [
+        '{0}-Start'.format(test_task_graph.id),
+        simple_before_task.id,
+        '{0}-Start'.format(inner_task_graph.id),
+        inner_task_1.id,
+        inner_task_2.id,
+        inner_task_3.id,
+        '{0}-End'.format(inner_task_graph.id),
+        simple_after_task.id,
+        '{0}-End'.format(test_task_graph.id)
+    ]
+
+    model_to_api_id = dict((model_task.id, api_id)
+                           for api_id, model_task in compiler._api_id_to_model_task.iteritems())
+    assert expected_tasks_names == [model_to_api_id[t.id] for t in execution_tasks]
+    assert all(isinstance(task, models.Task) for task in execution_tasks)
+    execution_tasks = iter(execution_tasks)
+
+    _assert_tasks(
+        iter(execution_tasks),
+        iter([simple_after_task, inner_task_1, inner_task_2, inner_task_3, simple_after_task])
+    )
+    storage.release_sqlite_storage(workflow_context.model)
+
+
+def test_optimized_task_graph_into_execution_graph(tmpdir):
+    workflow_context, api_tasks = _create_nested_task_graph(tmpdir)
+    test_task_graph, simple_before_task, _, inner_task_1, inner_task_2, inner_task_3, \
+        simple_after_task = api_tasks
+
+    compiler = graph_compiler.GraphCompiler(workflow_context, base.StubTaskExecutor, optimize=True)
+    compiler.compile(test_task_graph)
+
+    execution_tasks = tuple(topological_sort(_graph(workflow_context.execution.tasks)))
+
+    # The sub-workflow markers are elided
+    assert len(execution_tasks) == 7
+    expected_tasks_names = [
+        '{0}-Start'.format(test_task_graph.id),
+        simple_before_task.id,
+        inner_task_1.id,
+        inner_task_2.id,
+        inner_task_3.id,
+        simple_after_task.id,
+        '{0}-End'.format(test_task_graph.id)
+    ]
+    model_to_api_id = dict((model_task.id, api_id)
+                           for api_id, model_task in compiler._api_id_to_model_task.iteritems())
+    assert expected_tasks_names == [model_to_api_id[t.id] for t in execution_tasks]
+
+    # Every task depends only on its predecessor, since the dependency of inner_task_3 on
+    # inner_task_1 is implied by its dependency on inner_task_2
+    for previous_task, task in zip(execution_tasks, execution_tasks[1:]):
+        assert task.dependencies == [previous_task]
+    storage.release_sqlite_storage(workflow_context.model)
+
+
+def _create_nested_task_graph(tmpdir):
     interface_name = 'Standard'
     op1_name, op2_name, op3_name = 'create', 'configure', 'start'
     workflow_context = mock.context.simple(str(tmpdir))
@@ -80,33 +149,38 @@ def test_task_graph_into_execution_graph(tmpdir):
     test_task_graph.add_dependency(inner_task_graph, simple_before_task)
     test_task_graph.add_dependency(simple_after_task, inner_task_graph)
 
-    compiler = graph_compiler.GraphCompiler(workflow_context, base.StubTaskExecutor)
-    compiler.compile(test_task_graph)
+    return workflow_context, (test_task_graph, simple_before_task, inner_task_graph, inner_task_1,
+                              inner_task_2, inner_task_3, simple_after_task)
 
-    execution_tasks = tuple(topological_sort(_graph(workflow_context.execution.tasks)))
 
-    assert len(execution_tasks) == 9
-
-    expected_tasks_names = [
-        '{0}-Start'.format(test_task_graph.id),
-        simple_before_task.id,
-        '{0}-Start'.format(inner_task_graph.id),
-        inner_task_1.id,
-        inner_task_2.id,
-        inner_task_3.id,
-        '{0}-End'.format(inner_task_graph.id),
-        simple_after_task.id,
-        '{0}-End'.format(test_task_graph.id)
-    ]
+def test_tasks_are_stored_in_a_single_commit(tmpdir, mocker):
+    workflow_context = mock.context.simple(str(tmpdir))
+    node = workflow_context.model.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+    interface = mock.models.create_interface(
+        node.service, 'Standard', 'create', operation_kwargs=dict(function='test'))
+    node.interfaces[interface.name] = interface
+    workflow_context.model.node.update(node)
 
-    assert expected_tasks_names == [compiler._model_to_api_id[t.id] for t in execution_tasks]
-    assert all(isinstance(task, models.Task) for task in execution_tasks)
-    execution_tasks = iter(execution_tasks)
+    with context.workflow.current.push(workflow_context):
+        task_graph = api.task_graph.TaskGraph('test_task_graph')
+        independent_tasks = [api.task.OperationTask(node, 'Standard', 'create') for _ in range(5)]
+        sequential_tasks = [api.task.OperationTask(node, 'Standard', 'create') for _ in range(5)]
+        task_graph.add_tasks(*independent_tasks)
+        task_graph.sequence(*sequential_tasks)
 
-    _assert_tasks(
-        iter(execution_tasks),
-        iter([simple_after_task, inner_task_1, inner_task_2, inner_task_3, simple_after_task])
-    )
+    commit = mocker.spy(workflow_context.model.task._session, 'commit')
+    compiler = graph_compiler.GraphCompiler(workflow_context, base.StubTaskExecutor)
+    compiler.compile(task_graph)
+    assert commit.call_count == 1
+
+    execution_tasks = workflow_context.execution.tasks
+    assert len(execution_tasks) == 12
+    end_task = [task for task in execution_tasks
+                if task._stub_type == models.Task.END_WORKFLOW][0]
+    # The end marker depends on the tasks nothing else depends on
+    expected_dependencies = [compiler._api_id_to_model_task[api_task.id].id
+                             for api_task in independent_tasks + sequential_tasks[-1:]]
+    assert sorted(task.id for task in end_task.dependencies) == sorted(expected_dependencies)
     storage.release_sqlite_storage(workflow_context.model)
 
 
@@ -0,0 +1,77 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+
+import psutil
+
+from aria.orchestrator.workflows.executor import admission, thread
+
+
+_VirtualMemory = namedtuple('_VirtualMemory', 'available')
+
+
+class TestAdmissionControl(object):
+
+    def test_no_thresholds(self):
+        assert admission.AdmissionControl().check() is None
+
+    def test_cpu_percent(self, mocker):
+        mocker.patch.object(psutil, 'cpu_percent', return_value=95.0)
+        assert admission.AdmissionControl(max_cpu_percent=100).check() is None
+        assert admission.AdmissionControl(max_cpu_percent=90).check() == \
+            'CPU utilization is 95.0% (maximum is 90.0%)'
+
+    def test_available_memory(self, mocker):
+        mocker.patch.object(psutil, 'virtual_memory', return_value=_VirtualMemory(available=100))
+        assert admission.AdmissionControl(min_available_memory=100).check() is None
+        assert admission.AdmissionControl(min_available_memory=200).check() == \
+            'available memory is 100 bytes (minimum is 200 bytes)'
+
+    def test_open_files(self):
+        assert admission.AdmissionControl(max_open_files=100000).check() is None
+        assert admission.AdmissionControl(max_open_files=1).check().endswith(
+            'files are open (maximum is 1)')
+
+    def test_check_interval(self, mocker):
+        virtual_memory = mocker.patch.object(psutil, 'virtual_memory',
+                                             return_value=_VirtualMemory(available=100))
+        admission_control = admission.AdmissionControl(min_available_memory=200,
+                                                       check_interval=60)
+        assert admission_control.check() is not None
+        virtual_memory.return_value = _VirtualMemory(available=300)
+        # The previous sample is still fresh
+        assert admission_control.check() is not None
+        assert virtual_memory.call_count == 1
+
+        admission_control = admission.AdmissionControl(min_available_memory=200,
+                                                       check_interval=0)
+        assert admission_control.check() is None
+        virtual_memory.return_value = _VirtualMemory(available=100)
+        assert admission_control.check() is not None
+
+    def test_executor_back_pressure(self):
+        executor = thread.ThreadExecutor(
+            admission_control=admission.AdmissionControl(max_open_files=1))
+        try:
+            assert executor.back_pressure().endswith('files are open (maximum is 1)')
+        finally:
+            executor.close()
+
+        executor = thread.ThreadExecutor()
+        try:
+            assert executor.back_pressure() is None
+        finally:
+            executor.close()
@@ -0,0 +1,191 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import select
+import time
+
+import pytest
+import retrying
+
+from aria.modeling import models
+from aria.orchestrator import events, operation
+from aria.orchestrator.workflows.executor import coroutine
+
+from .. import helpers
+from . import MockContext
+
+
+_events = []
+
+pytestmark = pytest.mark.skipif(not hasattr(select, 'poll'), reason='requires select.poll')
+
+
+class TestCoroutineExecutor(object):
+
+    def test_concurrent_operations(self, executor):
+        contexts = [_create_context(sleeping_operation, name=str(i)) for i in range(3)]
+        start = time.time()
+        for ctx in contexts:
+            executor.execute(ctx)
+        _assert_states(contexts, ['start', 'success'])
+        # The operations slept at the same time
+        assert time.time() - start < 1.5
+
+    def test_concurrency_limit(self):
+        executor = coroutine.CoroutineExecutor(concurrency=1)
+        try:
+            contexts = [_create_context(sleeping_operation, name=str(i)) for i in range(2)]
+            for ctx in contexts:
+                executor.execute(ctx)
+            _assert_states(contexts, ['start', 'success'])
+            assert _events == ['0 started', '0 ended', '1 started', '1 ended']
+        finally:
+            executor.close()
+
+    def test_failing_start_handler(self):
+        def failing_start_handler(ctx, *args, **kwargs):
+            if getattr(ctx, 'fail_start', False):
+                raise MockException
+        executor = coroutine.CoroutineExecutor(concurrency=1)
+        events.start_task_signal.connect(failing_start_handler)
+        try:
+            failing_ctx = _create_context(sleeping_operation, name='0')
+            failing_ctx.fail_start = True
+            ctx = _create_context(sleeping_operation, name='1')
+            executor.execute(failing_ctx)
+            executor.execute(ctx)
+            # The failed task no longer counts towards the concurrency limit
+            _assert_states([ctx], ['start', 'success'])
+            assert failing_ctx.states[-1] == 'failure'
+            assert isinstance(failing_ctx.exception, MockException)
+            assert _events == ['1 started', '1 ended']
+        finally:
+            events.start_task_signal.disconnect(failing_start_handler)
+            executor.close()
+
+    def test_wait_readable(self, executor):
+        read_fd, write_fd = os.pipe()
+        try:
+            ctx = _create_context(reading_operation, fd=read_fd)
+            executor.execute(ctx)
+            time.sleep(0.2)
+            assert ctx.states == ['start']
+            os.write(write_fd, 'data')
+            _assert_states([ctx], ['start', 'success'])
+            assert _events == ['data']
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+
+    def test_failing_operation(self, executor):
+        ctx = _create_context(failing_operation)
+        executor.execute(ctx)
+        _assert_states([ctx], ['start', 'failure'])
+        assert isinstance(ctx.exception, MockException)
+
+    def test_invalid_yield(self, executor):
+        ctx = _create_context(invalid_yield_operation)
+        executor.execute(ctx)
+        _assert_states([ctx], ['start', 'success'])
+        assert _events == ['TypeError']
+
+    def test_decorated_operation(self, executor):
+        ctx = _create_context(decorated_operation, name='decorated')
+        executor.execute(ctx)
+        _assert_states([ctx], ['start', 'success'])
+        assert _events == ['decorated started', 'decorated ended']
+
+
+def sleeping_operation(name, **_):
+    _events.append('{0} started'.format(name))
+    yield coroutine.sleep(0.5)
+    _events.append('{0} ended'.format(name))
+
+
+def reading_operation(fd, **_):
+    yield coroutine.wait_readable(fd)
+    _events.append(os.read(fd, 4))
+
+
+def failing_operation(**_):
+    yield
+    raise MockException
+
+
+def invalid_yield_operation(**_):
+    try:
+        yield 'invalid'
+    except TypeError as e:
+        _events.append(type(e).__name__)
+
+
+@operation
+def decorated_operation(ctx, name, **_):
+    _events.append('{0} started'.format(name))
+    yield coroutine.sleep(0.1)
+    _events.append('{0} ended'.format(name))
+
+
+class MockException(Exception):
+    pass
+
+
+def _create_context(func, **arguments):
+    return MockContext(task_kwargs=dict(
+        function='{0}.{1}'.format(__name__, func.__name__),
+        arguments=dict((key, models.Argument.wrap(key, value))
+                       for key, value in arguments.iteritems())))
+
+
+def _assert_states(contexts, states):
+    @retrying.retry(stop_max_delay=10000, wait_fixed=100)
+    def assertion():
+        for ctx in contexts:
+            assert ctx.states == states
+    assertion()
+
+
+@pytest.fixture
+def executor():
+    result = coroutine.CoroutineExecutor()
+    yield result
+    result.close()
+
+
+@pytest.fixture(autouse=True)
+def register_signals():
+    def start_handler(ctx, *args, **kwargs):
+        ctx.states.append('start')
+
+    def success_handler(ctx, *args, **kwargs):
+        ctx.states.append('success')
+
+    def failure_handler(ctx, exception, *args, **kwargs):
+        ctx.states.append('failure')
+        ctx.exception = exception
+    with helpers.disconnect_event_handlers():
+        events.start_task_signal.connect(start_handler)
+        events.on_success_task_signal.connect(success_handler)
+        events.on_failure_task_signal.connect(failure_handler)
+        yield
+        events.start_task_signal.disconnect(start_handler)
+        events.on_success_task_signal.disconnect(success_handler)
+        events.on_failure_task_signal.disconnect(failure_handler)
+
+
+@pytest.fixture(autouse=True)
+def clear_events():
+    del _events[:]
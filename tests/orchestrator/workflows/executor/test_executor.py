@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import select
 
 import pytest
 import retrying
@@ -29,6 +30,7 @@ import aria
 from aria.modeling import models
 from aria.orchestrator import events
 from aria.orchestrator.workflows.executor import (
+    coroutine,
     thread,
     process,
     # celery
@@ -80,6 +82,11 @@ def test_process_execute(process_executor, storage):
     execute_and_assert(process_executor, storage)
 
 
+@pytest.mark.skipif(not hasattr(select, 'poll'), reason='requires select.poll')
+def test_coroutine_execute(coroutine_executor):
+    execute_and_assert(coroutine_executor)
+
+
 def mock_successful_task(**_):
     pass
 
@@ -123,9 +130,16 @@ def thread_executor(request):
     result.close()
 
 
-@pytest.fixture
-def process_executor():
-    result = process.ProcessExecutor(python_path=tests.ROOT_DIR)
+@pytest.fixture(params=[{}, {'concurrency': 1}])
+def coroutine_executor(request):
+    result = coroutine.CoroutineExecutor(**request.param)
+    yield result
+    result.close()
+
+
+@pytest.fixture(params=[{}, {'pool_size': 2}])
+def process_executor(request):
+    result = process.ProcessExecutor(python_path=tests.ROOT_DIR, **request.param)
     yield result
     result.close()
 
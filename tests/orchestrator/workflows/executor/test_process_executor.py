@@ -18,6 +18,7 @@ import sys
 import time
 import Queue
 import subprocess
+from datetime import datetime, timedelta
 
 import pytest
 import psutil
@@ -33,6 +34,7 @@ from aria.orchestrator.workflows.executor import process
 
 import tests.storage
 import tests.resources
+from tests import mock
 from tests.fixtures import (  # pylint: disable=unused-import
     plugins_dir,
     plugin_manager,
@@ -115,6 +117,101 @@ while True:
                 # making the test more readable
                 assert pid not in psutil.pids()
 
+    def test_subprocess_env_caching(self, executor, model, monkeypatch):
+        plugin = mock.models.create_plugin()
+        model.plugin.put(plugin)
+        plugin_task = MockContext(model, task_kwargs=dict(function='some.function',
+                                                          plugin_fk=plugin.id)).task
+        task = MockContext(model, task_kwargs=dict(function='some.function')).task
+
+        env_key, env = executor._get_subprocess_env(plugin_task)
+        assert executor._get_subprocess_env(plugin_task)[1] is env
+        assert executor._get_subprocess_env(task)[0] is None
+        assert executor._get_subprocess_env(task)[1] is not env
+
+        # Reinstalling the plugin
+        plugin.uploaded_at = datetime.now() + timedelta(seconds=1)
+        model.plugin.update(plugin)
+        assert executor._get_subprocess_env(plugin_task)[0] != env_key
+
+        monkeypatch.setenv('ARIA_TEST_VARIABLE', 'value')
+        assert executor._get_subprocess_env(task)[1]['ARIA_TEST_VARIABLE'] == 'value'
+
+    def test_arguments_size_info(self, executor, model, fs_test_holder, queue):
+        argument = models.Argument.wrap('holder_path', fs_test_holder._path)
+        model.argument.put(argument)
+        for _ in xrange(2):
+            ctx = MockContext(model, task_kwargs=dict(
+                function='{0}.{1}'.format(__name__, pid_recording_task.__name__),
+                arguments=dict(holder_path=argument)))
+            executor.execute(ctx)
+            assert queue.get(timeout=60) is None
+        info = executor.arguments_size_info
+        assert info.tasks == 2
+        assert 0 < info.max <= info.total <= 2 * info.max
+
+
+class TestProcessExecutorPool(object):
+
+    def test_worker_reuse(self, pool_executor, model, fs_test_holder, queue):
+        pids = self._run_tasks(pool_executor, model, fs_test_holder, queue, count=3)
+        assert len(set(pids)) == 1
+        assert pids[0] != os.getpid()
+
+    def test_plugin_execution(self, pool_executor, mock_plugin, model, queue):
+        for _ in xrange(2):
+            ctx = MockContext(
+                model,
+                task_kwargs=dict(function='mock_plugin1.operation', plugin_fk=mock_plugin.id)
+            )
+            pool_executor.execute(ctx)
+            error = queue.get(timeout=60)
+            assert isinstance(error, RuntimeError)
+            assert error.message == 'mock-plugin-output'
+
+    def test_worker_recycling(self, plugin_manager, model, fs_test_holder, queue):
+        executor = process.ProcessExecutor(plugin_manager=plugin_manager,
+                                           python_path=[tests.ROOT_DIR],
+                                           pool_size=1,
+                                           max_tasks_per_worker=2)
+        try:
+            pids = self._run_tasks(executor, model, fs_test_holder, queue, count=3)
+        finally:
+            executor.close()
+        assert pids[0] == pids[1]
+        assert pids[1] != pids[2]
+
+    def test_worker_state_is_restored(self, pool_executor, model, fs_test_holder, queue):
+        argument = models.Argument.wrap('holder_path', fs_test_holder._path)
+        model.argument.put(argument)
+        for _ in xrange(2):
+            ctx = MockContext(model, task_kwargs=dict(
+                function='{0}.{1}'.format(__name__, environment_changing_task.__name__),
+                arguments=dict(holder_path=argument)))
+            pool_executor.execute(ctx)
+            assert queue.get(timeout=60) is None
+        assert fs_test_holder['environment'] == [None, None]
+
+    def test_idle_worker_termination(self, pool_executor, model, fs_test_holder, queue):
+        pid = self._run_tasks(pool_executor, model, fs_test_holder, queue, count=1)[0]
+        psutil.Process(pid).kill()
+        psutil.Process(pid).wait(timeout=60)
+        assert self._run_tasks(pool_executor, model, fs_test_holder, queue, count=1)[0] != pid
+
+    @staticmethod
+    def _run_tasks(executor, model, fs_test_holder, queue, count):
+        argument = models.Argument.wrap('holder_path', fs_test_holder._path)
+        model.argument.put(argument)
+        for _ in xrange(count):
+            ctx = MockContext(model, task_kwargs=dict(
+                function='{0}.{1}'.format(__name__, pid_recording_task.__name__),
+                arguments=dict(holder_path=argument)))
+            executor.execute(ctx)
+            assert queue.get(timeout=60) is None
+        pids = fs_test_holder['pids']
+        fs_test_holder['pids'] = []
+        return pids
+
 
 @pytest.fixture
 def queue():
@@ -150,6 +247,17 @@ def executor(plugin_manager):
         result.close()
 
 
+@pytest.fixture
+def pool_executor(plugin_manager):
+    result = process.ProcessExecutor(plugin_manager=plugin_manager,
+                                     python_path=[tests.ROOT_DIR],
+                                     pool_size=1)
+    try:
+        yield result
+    finally:
+        result.close()
+
+
 @pytest.fixture
 def mock_plugin(plugin_manager, tmpdir):
     source = os.path.join(tests.resources.DIR, 'plugins', 'mock-plugin1')
@@ -171,3 +279,16 @@ def freezing_task(holder_path, freezing_script_path, **_):
     holder['subproc'] = subprocess.Popen([sys.executable, freezing_script_path], shell=True).pid
     while True:
         time.sleep(5)
+
+
+@operation
+def pid_recording_task(holder_path, **_):
+    holder = FilesystemDataHolder(holder_path)
+    holder['pids'] = holder.get('pids', []) + [os.getpid()]
+
+
+@operation
+def environment_changing_task(holder_path, **_):
+    holder = FilesystemDataHolder(holder_path)
+    holder['environment'] = holder.get('environment', []) + [os.environ.get('ARIA_TEST_VARIABLE')]
+    os.environ['ARIA_TEST_VARIABLE'] = 'value'
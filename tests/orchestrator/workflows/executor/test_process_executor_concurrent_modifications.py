@@ -58,10 +58,35 @@ def _test_task_failed(ctx, lock_files, key, first_value, second_value, holder_pa
         raise RuntimeError('MESSAGE')
 
 
-def _test(context, executor, lock_files, func, dataholder, expected_failure):
-    def _node(ctx):
-        return ctx.model.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+def test_concurrent_modification_version_conflict(context, executor, lock_files, dataholder):
+    exceptions = _test(context, executor, lock_files, _test_version_conflict, dataholder,
+                       expected_failure=True, check_attribute=False)
+    # One of the tasks changed the node after the other one loaded it; the version check of the
+    # other task's commit failed (StaleDataError), with or without a proxy
+    assert len(exceptions) == 1
+    assert str(exceptions[0]).startswith('Version conflict: ')
+    assert _node(context).description == dataholder['key']
 
+
+# Not an @operation: the node has to be the model itself, since the instrumented model doesn't
+# pass the attributes set on it through to the model
+def _test_version_conflict(ctx, lock_files, key, first_value, second_value, holder_path):
+    node = ctx.node
+
+    def update(value):
+        node.description = value
+        ctx.model.node.update(node)
+
+    _concurrent_update(lock_files, node, key, first_value, second_value, holder_path,
+                       update=update)
+
+
+def _node(ctx):
+    return ctx.model.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+
+
+def _test(context, executor, lock_files, func, dataholder, expected_failure,
+          check_attribute=True):
     interface_name, operation_name = mock.operations.NODE_OPERATIONS_INSTALL[0]
 
     key = 'key'
@@ -108,18 +133,20 @@ def _test(context, executor, lock_files, func, dataholder, expected_failure):
         except ExecutorException:
             pass
 
-    props = _node(context).attributes
     assert dataholder['invocations'] == 2
-    assert props[key].value == dataholder[key]
+    if check_attribute:
+        props = _node(context).attributes
+        assert props[key].value == dataholder[key]
 
     exceptions = [event['kwargs']['exception'] for event in collected.get(signal, [])]
     if expected_failure:
         assert exceptions
+    return exceptions
 
 
-@pytest.fixture
-def executor():
-    result = process.ProcessExecutor(python_path=[tests.ROOT_DIR])
+@pytest.fixture(params=[{}, {'proxy_commits': True}])
+def executor(request):
+    result = process.ProcessExecutor(python_path=[tests.ROOT_DIR], **request.param)
     try:
         yield result
     finally:
@@ -138,7 +165,8 @@ def lock_files(tmpdir):
     return str(tmpdir.join('first_lock_file')), str(tmpdir.join('second_lock_file'))
 
 
-def _concurrent_update(lock_files, node, key, first_value, second_value, holder_path):
+def _concurrent_update(lock_files, node, key, first_value, second_value, holder_path,
+                       update=None):
     holder = helpers.FilesystemDataHolder(holder_path)
     locker1 = fasteners.InterProcessLock(lock_files[0])
     locker2 = fasteners.InterProcessLock(lock_files[1])
@@ -153,15 +181,21 @@ def _concurrent_update(lock_files, node, key, first_value, second_value, holder_
     else:
         locker2.acquire()
 
-    node.attributes[key] = first_value if first else second_value
-    holder['key'] = first_value if first else second_value
-    holder.setdefault('invocations', 0)
-    holder['invocations'] += 1
-
-    if first:
-        locker1.release()
-    else:
-        with locker1:
-            locker2.release()
+    value = first_value if first else second_value
+    try:
+        if update is None:
+            node.attributes[key] = value
+        else:
+            update(value)
+        holder['key'] = value
+    finally:
+        holder.setdefault('invocations', 0)
+        holder['invocations'] += 1
+
+        if first:
+            locker1.release()
+        else:
+            with locker1:
+                locker2.release()
 
     return first
@@ -83,9 +83,9 @@ def _mock_operation(ctx, **operation_arguments):
     ctx.node.attributes['out']['function_arguments'] = operation_arguments
 
 
-@pytest.fixture
-def executor():
-    result = process.ProcessExecutor(python_path=[tests.ROOT_DIR])
+@pytest.fixture(params=[{}, {'pool_size': 1}])
+def executor(request):
+    result = process.ProcessExecutor(python_path=[tests.ROOT_DIR], **request.param)
     try:
         yield result
     finally:
@@ -152,9 +152,9 @@ def _operation_mapping(func):
     return '{name}.{func.__name__}'.format(name=__name__, func=func)
 
 
-@pytest.fixture
-def executor():
-    result = process.ProcessExecutor(python_path=[tests.ROOT_DIR])
+@pytest.fixture(params=[{}, {'proxy_commits': True}])
+def executor(request):
+    result = process.ProcessExecutor(python_path=[tests.ROOT_DIR], **request.param)
     try:
         yield result
     finally:
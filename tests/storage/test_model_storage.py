@@ -18,7 +18,9 @@ import pytest
 from sqlalchemy import (
     Column,
     Integer,
-    Text
+    Text,
+    event,
+    exc as sa_exc
 )
 
 from aria import (
@@ -71,6 +73,86 @@ def test_model_storage(storage):
         storage.mock_model.get(mock_model.id)
 
 
+def test_iter_in_batches(storage):
+    storage.mock_model.put_many(tests_modeling.MockModel(value=i, name=str(i)) for i in range(5))
+    models = storage.mock_model.list(sort={'id': 'asc'})
+
+    assert list(storage.mock_model.iter(batch_size=2)) == models
+    assert list(storage.mock_model.iter(batch_size=5)) == models
+    assert list(storage.mock_model.iter(filters=dict(value=dict(gt=1)), batch_size=2)) == \
+        models[2:]
+    assert [row.id for row in storage.mock_model.iter(include=['id', 'name'], batch_size=2)] == \
+        [model.id for model in models]
+
+    # Committing while iterating doesn't interfere
+    for model in storage.mock_model.iter(batch_size=2):
+        model.value += 10
+        storage.mock_model.update(model)
+    assert [model.value for model in storage.mock_model.iter(batch_size=2)] == range(10, 15)
+
+    with pytest.raises(exceptions.StorageError):
+        list(storage.mock_model.iter(sort={'name': 'asc'}, batch_size=2))
+    with pytest.raises(exceptions.StorageError):
+        list(storage.mock_model.iter(include=['name'], batch_size=2))
+
+
+def test_put_many_and_update_many(storage, commits):
+    mock_models = storage.mock_model.put_many(
+        tests_modeling.MockModel(value=i, name='model{0}'.format(i)) for i in range(3))
+    assert len(commits) == 1
+    assert all(mock_model.id is not None for mock_model in mock_models)
+
+    for mock_model in mock_models:
+        mock_model.value += 10
+    storage.mock_model.update_many(mock_models)
+    assert len(commits) == 2
+    storage.mock_model.refresh(mock_models[0])
+    assert sorted(mm.value for mm in storage.mock_model.list()) == [10, 11, 12]
+
+
+def test_batch(storage, commits):
+    with storage.batch():
+        mock_model = storage.mock_model.put(tests_modeling.MockModel(value=0, name='model_name'))
+        # Flushed, but not committed
+        assert mock_model.id is not None
+        assert storage.mock_model.get_by_name('model_name') == mock_model
+        mock_model.value = 1
+        storage.mock_model.update(mock_model)
+        with storage.batch():
+            storage.mock_model.put(tests_modeling.MockModel(value=2, name='model_name2'))
+        assert commits == []
+    assert len(commits) == 1
+    assert len(storage.mock_model.list()) == 2
+
+    # Outside the batch, writes are committed right away
+    storage.mock_model.delete(mock_model)
+    assert len(commits) == 2
+
+
+def test_failed_batch(storage, commits):
+    with pytest.raises(RuntimeError):
+        with storage.batch():
+            storage.mock_model.put(tests_modeling.MockModel(value=0, name='model_name'))
+            with storage.batch():
+                storage.mock_model.put(tests_modeling.MockModel(value=1, name='model_name2'))
+            raise RuntimeError
+    assert commits == []
+    assert len(storage.mock_model.list()) == 0
+
+    storage.mock_model.put(tests_modeling.MockModel(value=0, name='model_name'))
+    assert len(commits) == 1
+
+
+@pytest.fixture
+def commits(storage):
+    result = []
+
+    def after_commit(session):
+        result.append(session)
+    event.listen(storage._all_api_kwargs['session'], 'after_commit', after_commit)
+    return result
+
+
 def test_application_storage_factory():
     storage = application_model_storage(sql_mapi.SQLAlchemyModelAPI,
                                         initiator=tests_storage.init_inmemory_model_storage)
@@ -118,6 +200,30 @@ def test_application_storage_factory():
     tests_storage.release_sqlite_storage(storage)
 
 
+def test_sqlite_profile(tmpdir):
+    storage = application_model_storage(sql_mapi.SQLAlchemyModelAPI,
+                                        initiator=sql_mapi.init_storage,
+                                        initiator_kwargs=dict(base_dir=str(tmpdir),
+                                                              profile=sql_mapi.SQLITE_PROFILE))
+    try:
+        engine = storage._all_api_kwargs['engine']
+        assert engine.execute('PRAGMA journal_mode').scalar() == 'wal'
+        # NORMAL
+        assert engine.execute('PRAGMA synchronous').scalar() == 1
+        assert engine.execute('PRAGMA cache_size').scalar() == \
+            sql_mapi.SQLITE_PROFILE['cache_size']
+        assert engine.pool.size() == sql_mapi.SQLITE_PROFILE['pool_size']
+    finally:
+        tests_storage.release_sqlite_storage(storage)
+
+
+def test_invalid_sqlite_profile(tmpdir):
+    with pytest.raises(exceptions.StorageError):
+        sql_mapi.init_storage(str(tmpdir), profile=dict(journal_mode='wal; DROP TABLE task'))
+    with pytest.raises(exceptions.StorageError):
+        sql_mapi.init_storage(str(tmpdir), profile=dict(unknown=1))
+
+
 def test_cascade_deletion(context):
     service = context.model.service.list()[0]
 
@@ -162,6 +268,65 @@ def test_mapi_include(context):
     assert_include(service2)
 
 
+class TestLoad(object):
+
+    @pytest.fixture
+    def statements(self, context):
+        result = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):                                 # pylint: disable=unused-argument
+            result.append(statement)
+        context.model.node.list()
+        # Models are loaded afresh, so that loading options apply to them
+        context.model._all_api_kwargs['session'].expire_all()
+        event.listen(context.model._all_api_kwargs['engine'], 'before_cursor_execute',
+                     before_cursor_execute)
+        yield result
+        event.remove(context.model._all_api_kwargs['engine'], 'before_cursor_execute',
+                     before_cursor_execute)
+
+    def test_load_paths(self, context, statements):
+        nodes = context.model.node.list(load=['interfaces.operations', 'outbound_relationships',
+                                              'service'])
+        number_of_statements = len(statements)
+        for node in nodes:
+            for interface in node.interfaces.values():
+                assert interface.operations
+            assert node.outbound_relationships is not None
+            assert node.service
+        assert len(statements) == number_of_statements
+
+    def test_iter_and_get(self, context, statements):
+        nodes = list(context.model.node.iter(load=['interfaces']))
+        node = context.model.node.get(nodes[0].id, load=['outbound_relationships'])
+        number_of_statements = len(statements)
+        assert node.interfaces is not None
+        assert node.outbound_relationships is not None
+        assert len(statements) == number_of_statements
+
+    def test_raise(self, context, statements):
+        node = context.model.node.list(load={'interfaces': 'subquery', '*': 'raise'})[0]
+        assert node.interfaces is not None
+        with pytest.raises(sa_exc.InvalidRequestError):
+            node.outbound_relationships                                                             # pylint: disable=pointless-statement
+
+    def test_invalid_load(self, context, statements):                                              # pylint: disable=unused-argument
+        with pytest.raises(exceptions.StorageError):
+            context.model.node.list(load=['interfaces.no_such_relationship'])
+        with pytest.raises(exceptions.StorageError):
+            context.model.node.list(load={'interfaces': 'no_such_strategy'})
+        with pytest.raises(exceptions.StorageError):
+            context.model.node.list(load=['interfaces'], include=['id'])
+
+    def test_refresh_attributes(self, context, statements):
+        node = context.model.node.list()[0]
+        node.description = 'changed'
+        del statements[:]
+        context.model.node.refresh(node, attributes=['description'])
+        assert node.description != 'changed'
+        assert len(statements) == 1
+
+
 class MockModel(modeling.models.aria_declarative_base, modeling.mixins.ModelMixin):                 # pylint: disable=abstract-method
     __tablename__ = 'op_mock_model'
 
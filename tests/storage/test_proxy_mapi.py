@@ -0,0 +1,147 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+from datetime import datetime
+
+import pytest
+
+import aria
+from aria.modeling import models
+from aria.storage import (
+    proxy_mapi,
+    sql_mapi,
+    exceptions
+)
+
+from tests import mock
+from tests import storage as tests_storage
+
+
+def test_update(storage, proxied_storage, commits):
+    node = proxied_storage.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+    node.attributes['new'] = models.Attribute.wrap('new', 'value')
+    node.attributes['key'].value = 'changed'
+    proxied_storage.node.update(node)
+
+    assert len(commits) == 1
+    node = storage.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+    storage.node.refresh(node)
+    assert node.attributes['new'].value == 'value'
+    assert node.attributes['key'].value == 'changed'
+
+    # The proxied storage reloads the changes written by the proxy
+    node = proxied_storage.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+    assert node.attributes['new'].value == 'value'
+
+
+def test_put(storage, proxied_storage):
+    execution = proxied_storage.execution.list()[0]
+    log = models.Log(execution=execution, msg='message', level=0, created_at=datetime.now())
+    proxied_storage.log.put(log)
+
+    assert log.id is not None
+    assert log.execution == execution
+    assert storage.log.get(log.id).msg == 'message'
+
+
+def test_batch(storage, proxied_storage, commits):
+    execution = proxied_storage.execution.list()[0]
+    with proxied_storage.batch():
+        logs = proxied_storage.log.put_many(
+            models.Log(execution=execution, msg=str(i), level=0, created_at=datetime.now())
+            for i in range(2))
+        execution.status = execution.STARTED
+        proxied_storage.execution.update(execution)
+        assert commits == []
+
+    assert len(commits) == 1
+    assert all(log.id is not None for log in logs)
+    assert sorted(log.msg for log in storage.log.list()) == ['0', '1']
+    assert storage.execution.get(execution.id).status == execution.STARTED
+
+
+def test_delete(storage, proxied_storage):
+    execution = storage.execution.list()[0]
+    log = models.Log(execution=execution, msg='message', level=0, created_at=datetime.now())
+    storage.log.put(log)
+
+    proxied_storage.log.delete(proxied_storage.log.get(log.id))
+    with pytest.raises(exceptions.NotFoundError):
+        storage.log.get(log.id)
+
+
+def test_version_conflict(storage, proxied_storage):
+    proxied_node = proxied_storage.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+    node = storage.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+    node.description = 'first'
+    storage.node.update(node)
+
+    # Changed after the proxied storage loaded it
+    proxied_node.description = 'second'
+    with pytest.raises(exceptions.StorageError) as e:
+        proxied_storage.node.update(proxied_node)
+    assert 'Version conflict' in str(e.value)
+    storage.node.refresh(node)
+    assert node.description == 'first'
+
+
+def test_failed_commit(proxied_storage, commits):
+    def failing_proxy(changes):
+        raise exceptions.StorageError('failed')
+    for mapi in proxied_storage.registered.itervalues():
+        mapi._commit_proxy = failing_proxy
+
+    node = proxied_storage.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+    node.attributes['key'].value = 'changed'
+    with pytest.raises(exceptions.StorageError):
+        proxied_storage.node.update(node)
+
+    # The changes were discarded
+    node = proxied_storage.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+    assert node.attributes['key'].value == 'value'
+
+
+@pytest.fixture
+def commits():
+    return []
+
+
+@pytest.fixture
+def storage(tmpdir):
+    result = aria.application_model_storage(sql_mapi.SQLAlchemyModelAPI,
+                                            initiator_kwargs=dict(base_dir=str(tmpdir)))
+    mock.topology.create_simple_topology_two_nodes(result)
+    node = result.node.get_by_name(mock.models.DEPENDENCY_NODE_NAME)
+    node.attributes['key'] = models.Attribute.wrap('key', 'value')
+    result.node.update(node)
+    result.execution.put(mock.models.create_execution(result.service.list()[0]))
+    yield result
+    tests_storage.release_sqlite_storage(result)
+
+
+@pytest.fixture
+def proxied_storage(storage, commits, tmpdir):
+    def commit_proxy(changes):
+        # Changes cross process boundaries
+        changes = pickle.loads(pickle.dumps(changes))
+        commits.append(changes)
+        return proxy_mapi.apply_changes(storage._all_api_kwargs['session'], changes)
+
+    result = aria.application_model_storage(proxy_mapi.ProxyModelAPI,
+                                            api_kwargs=dict(commit_proxy=commit_proxy),
+                                            initiator_kwargs=dict(base_dir=str(tmpdir)))
+    yield result
+    result._all_api_kwargs['session'].close()